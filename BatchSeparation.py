@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+## Layout.spreadOutRooms(engine='numpy'), the grid engine's separation
+## done on whole arrays of rooms at once, in grid units.  Needs numpy,
+## which Layout only imports when this engine is asked for.
+
+import numpy as np
+
+def overlappingPairs(x0,y0,x1,y1,budget=1<<22):
+    '''
+    Sort and sweep along x, returns the index arrays (a,b) of every pair of
+    boxes that overlap.  Boxes are the half open [x0,x1) x [y0,y1).  The
+    candidate pairs are built budget at a time to bound memory when most of
+    the boxes are piled on top of each other.
+    '''
+    n = len(x0)
+    order = np.argsort(x0,kind='stable')
+    sx0 = x0[order]
+    # candidates for the i'th box are the boxes after it that start before it ends
+    ends = np.searchsorted(sx0,x1[order],'left')
+    counts = np.maximum(ends - np.arange(1,n+1),0)
+    total = np.cumsum(counts)
+
+    found_a = []
+    found_b = []
+    start = 0
+    while start < n:
+        stop = int(np.searchsorted(total,total[start] - counts[start] + budget,'right'))
+        stop = min(max(stop,start+1),n)
+        c = counts[start:stop]
+        m = int(c.sum())
+        if m:
+            i = np.repeat(np.arange(start,stop),c)
+            # offset of each candidate within its run of candidates
+            j = np.arange(m) - np.repeat(np.cumsum(c) - c,c) + i + 1
+            a = order[i]
+            b = order[j]
+            hit = (x0[b] < x1[a]) & (y0[a] < y1[b]) & (y0[b] < y1[a])
+            found_a.append(a[hit])
+            found_b.append(b[hit])
+        start = stop
+
+    if not found_a:
+        empty = np.zeros(0,dtype=np.intp)
+        return empty,empty
+    return np.concatenate(found_a),np.concatenate(found_b)
+
+
+class BatchSeparation(object):
+    '''
+    The rooms of a layout as arrays of grid units.  Each step finds every
+    overlapping pair and moves all of the overlapping rooms at once.
+    '''
+
+    def __init__(self,layout,crowd=16,pressure=0.5):
+        rooms = layout.rooms
+        self.rooms = rooms
+        self.crowd = crowd
+        self.pressure = pressure
+        # numpy's own generator, seeded from the layout's so runs repeat
+        self.rng = np.random.default_rng(layout.rng.getrandbits(64))
+        self.x = np.array([r.gx for r in rooms],dtype=np.int64)
+        self.y = np.array([r.gy for r in rooms],dtype=np.int64)
+        self.w = np.array([r.width for r in rooms],dtype=np.int64)
+        self.h = np.array([r.height for r in rooms],dtype=np.int64)
+        self.id = np.array([r.id for r in rooms],dtype=np.int64)
+
+    def overlaps(self):
+        '''
+        Returns the (a,b) index arrays of the overlapping rooms, rooms only
+        sharing an edge don't count.
+        '''
+        x,y,w,h = self.x,self.y,self.w,self.h
+        return overlappingPairs(x,y,x+w,y+h)
+
+    def step(self):
+        '''
+        One iteration, returns False if there was nothing to separate.
+        '''
+        a,b = self.overlaps()
+        if not len(a):
+            return False
+
+        x,y,w,h = self.x,self.y,self.w,self.h
+        n = len(x)
+
+        # distance to move until each pair only shares an edge
+        px = np.minimum(x[a]+w[a],x[b]+w[b]) - np.maximum(x[a],x[b])
+        py = np.minimum(y[a]+h[a],y[b]+h[b]) - np.maximum(y[a],y[b])
+
+        # centers are doubled to keep them in whole grid units
+        cx = 2*x + w
+        cy = 2*y + h
+        ida = self.id[a]
+        idb = self.id[b]
+        sx = np.where((cx[a] > cx[b]) | ((cx[a] == cx[b]) & (ida > idb)),1,-1)
+        sy = np.where((cy[a] > cy[b]) | ((cy[a] == cy[b]) & (ida > idb)),1,-1)
+        alongx = px < py
+        mx = np.where(alongx,px * sx,0)
+        my = np.where(alongx,0,py * sy)
+
+        # each pair pushes both of its rooms, in opposite directions
+        dx = np.bincount(a,mx,n) - np.bincount(b,mx,n)
+        dy = np.bincount(a,my,n) - np.bincount(b,my,n)
+        k = np.bincount(a,minlength=n) + np.bincount(b,minlength=n)
+
+        # like the grid engine, only crowd overlaps worth of push per room
+        # and crowded rooms are pushed away from the middle of the dungeon
+        kept = np.minimum(k,self.crowd)
+        scale = np.where(k > 0,kept / np.maximum(k,1),0)
+        crowding = self.pressure * kept / self.crowd
+        bx = x.min() + (x+w).max()
+        by = y.min() + (y+h).max()
+        dx = dx * scale + (cx - bx) * crowding / 2
+        dy = dy * scale + (cy - by) * crowding / 2
+
+        # the same jitter as RoomRecord.push
+        moving = k > 0
+        m = int(moving.sum())
+        rng = self.rng
+        dx = np.rint(dx).astype(np.int64)
+        dy = np.rint(dy).astype(np.int64)
+        dx[moving] += rng.integers(-1,2,m)
+        dy[moving] += rng.integers(-1,2,m)
+
+        self.x = x + dx
+        self.y = y + dy
+        return True
+
+    def store(self):
+        '''
+        Copies the positions back into the layout's rooms.
+        '''
+        for room,x,y in zip(self.rooms,self.x.tolist(),self.y.tolist()):
+            room.gx = x
+            room.gy = y
+
+
+def spreadOutRooms(layout,limit=None):
+    '''
+    Separates the layout's rooms, running at most limit iterations or until
+    done if limit is None.  Returns whether no rooms overlap and the number
+    of iterations run.
+    '''
+    rooms = BatchSeparation(layout)
+    steps = 0
+    done = False
+    while limit is None or steps < limit:
+        steps += 1
+        if not rooms.step():
+            done = True
+            break
+    rooms.store()
+    return done,steps
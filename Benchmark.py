@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+
+## Times the dungeon generator without pygame.  Each benchmark prints one
+## line per configuration, e.g.:
+##
+##   python3 Benchmark.py separation --seedRooms 150 1000 5000
+##   python3 Benchmark.py infill --sizes 1024 4096 16384
+##   python3 Benchmark.py many --count 64 --workers 1 2 4 8
+##   python3 Benchmark.py stages --seedRooms 50 1000 --output results.jsonl
+##   python3 Benchmark.py gridstep --seedRooms 1000 5000
+
+import argparse
+import copy
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from Layout import Layout, collide_rooms, center, colliderect, inflate, unionall
+from Pipeline import Pipeline
+from SpatialHash import SpatialHash
+
+
+def seededLayout(seedRooms,width=1024,height=1024,maxRoomDimension=10,
+                 gridSpacing=8,seed=0,seeding='uniform'):
+    '''
+    Returns a layout with seedRooms random rooms that haven't been spread out.
+    '''
+    layout = Layout(width,height,maxRoomDimension,maxRoomDimension,gridSpacing,
+                    random.Random(seed))
+    # same as Layout.generate
+    if seeding == 'poisson':
+        layout.addPoissonRooms(seedRooms,layout.radius/5)
+    else:
+        for x in range(0,seedRooms):
+            layout.addRandomRoom(layout.radius/5)
+    return layout
+
+
+def separation(seedRooms,engines,limit,seed=0,seeding='uniform'):
+    '''
+    Spreads out the same seeded rooms with each engine, reporting the time,
+    the iterations used and any overlaps left if the limit ran out.
+    '''
+    for n in seedRooms:
+        for engine in engines:
+            layout = seededLayout(n,seed=seed,seeding=seeding)
+            steps = 0
+            done = False
+            start = time.perf_counter()
+            while not done and steps < limit:
+                done = layout.spreadOutRooms(1,engine)
+                steps += 1
+            elapsed = time.perf_counter() - start
+            overlaps = len(layout.broadphase.pairs(collide_rooms))
+            print('separation seedRooms=%-6d seeding=%-8s engine=%-8s %9.3fs steps=%-6d overlaps=%d%s' %
+                  (n,seeding,engine,elapsed,steps,overlaps,'' if done else ' (gave up)'))
+
+
+def collideInFill(layout,bounds):
+    '''
+    The original inFillWithVoids, a unit room for every grid cell collided
+    with every room, kept here to compare against.
+    '''
+    grid = layout.gridSpacing+1
+    bx,by,bw,bh = bounds
+    rooms = list(layout.rooms)
+    for x in range(bx,bx + bw - grid,grid):
+        for y in range(by,by + bh - grid,grid):
+            r = layout.newRoom(x,y)
+            for room in rooms:
+                if collide_rooms(r,room):
+                    break
+            else:
+                layout.rooms.append(r)
+
+
+def infill(sizes,methods,seedRooms,seed=0):
+    '''
+    Fills dungeons of each size with voids, all the way to the edges of
+    the dungeon.  Reports the time and, from a second run, the peak memory
+    traced while filling.
+    '''
+    fillers = {'bitmap':  lambda l,b: l.inFillWithVoids(bounds=b,materialise=False),
+               'records': lambda l,b: l.inFillWithVoids(bounds=b),
+               'collide': collideInFill}
+
+    for size in sizes:
+        layout = seededLayout(seedRooms,size,size,seed=seed)
+        layout.spreadOutRooms()
+        layout.centerIn(layout.rect)
+        bounds = layout.rect
+        for method in methods:
+            fill = fillers[method]
+
+            l = copy.deepcopy(layout)
+            start = time.perf_counter()
+            fill(l,bounds)
+            elapsed = time.perf_counter() - start
+            voids = len(l.rooms) - len(layout.rooms)
+            if method == 'bitmap':
+                voids = l.occupancy.count(0)
+            del(l)
+
+            l = copy.deepcopy(layout)
+            tracemalloc.start()
+            fill(l,bounds)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del(l)
+
+            print('infill size=%-6d method=%-8s %9.3fs peak=%9.1fMB voids=%d' %
+                  (size,method,elapsed,peak / 1e6,voids))
+
+
+def many(count,workers,seedRooms):
+    '''
+    Generates count dungeons with Parallel.generate_many for each number of
+    workers, reporting dungeons per second.
+    '''
+    from Parallel import generate_many
+
+    for w in workers:
+        start = time.perf_counter()
+        done = 0
+        for seed,data in generate_many(count,workers=w,seedRooms=seedRooms):
+            done += 1
+        elapsed = time.perf_counter() - start
+        print('many count=%-5d workers=%-3d %9.3fs %8.2f dungeons/s' %
+              (done,w,elapsed,done / elapsed))
+
+
+def floatRoundm(n,m):
+    '''
+    The original Layout.roundm, float division for everything.
+    '''
+    rnd = lambda x: math.floor((x+m-1)/m)*m
+    try:
+        return [x for x in rnd(n)]
+    except TypeError:
+        return rnd(n)
+
+class PixelRoom(object):
+    '''
+    The original RoomRecord, a room kept at a position in pixels, kept here
+    to compare against.
+    '''
+    __slots__ = ('id','x','y','w','h','vx','vy')
+
+    def __init__(self,room):
+        self.id = room.id
+        self.x,self.y,self.w,self.h = room.rect
+        self.vx = 0
+        self.vy = 0
+
+    @property
+    def rect(self):
+        return (self.x,self.y,self.w,self.h)
+
+    def push(self,dx,dy,rng):
+        self.vx += dx + rng.randint(-10,10) * rng.randint(-1,1)
+        self.vy += dy + rng.randint(-10,10) * rng.randint(-1,1)
+
+    def move(self):
+        self.x += self.vx
+        self.y += self.vy
+
+    def stop(self):
+        self.vx = 0
+        self.vy = 0
+
+def rectCollideRooms(left,right):
+    '''
+    The original collide_rooms, building both rooms' rects every test.
+    '''
+    if left is right:
+        return False
+    ax,ay,aw,ah = left.rect
+    bx,by,bw,bh = right.rect
+    if aw > 2 and ah > 2 and bw > 2 and bh > 2:
+        return ax < bx+bw-2 and bx < ax+aw-2 and ay < by+bh-2 and by < ay+ah-2
+    return colliderect(inflate(left.rect,-2,-2),inflate(right.rect,-2,-2))
+
+def floatGridStep(rooms,index,grid,rng,crowd=16,pressure=0.5):
+    '''
+    The original Layout._gridStep on PixelRooms, each room pushed, moved,
+    snapped with floatRoundm and stopped through its own methods, kept
+    here to compare against.
+    '''
+    mx,my = center(unionall([r.rect for r in rooms]))
+    for room in rooms:
+        others = index.collide(room,rectCollideRooms,crowd)
+        if not len(others):
+            continue
+        dx = dy = 0
+        cx,cy = center(room.rect)
+        for other in others:
+            ox,oy = center(other.rect)
+            px = min(room.x+room.w,other.x+other.w) - max(room.x,other.x) - 1
+            py = min(room.y+room.h,other.y+other.h) - max(room.y,other.y) - 1
+            px = -(-px // grid) * grid
+            py = -(-py // grid) * grid
+            if px < py:
+                dx += px if (cx,room.id) > (ox,other.id) else -px
+            else:
+                dy += py if (cy,room.id) > (oy,other.id) else -py
+        crowding = pressure * len(others) / crowd
+        dx += (cx - mx) * crowding
+        dy += (cy - my) * crowding
+        room.push(dx,dy,rng)
+        room.move()
+        room.x = floatRoundm(room.x,grid)
+        room.y = floatRoundm(room.y,grid)
+        room.stop()
+        index.move(room)
+
+def gridstep(seedRooms,iterations,seed=0):
+    '''
+    Times iterations of the grid separation engine's inner loop, the
+    original float version on rooms kept in pixels against
+    Layout._gridStep on rooms kept in whole grid units, from the same
+    seeded rooms.  The two round their pushes differently so the rooms
+    don't end up in exactly the same places; the overlaps left after the
+    iterations show both spread as well.
+    '''
+    for n in seedRooms:
+        after = seededLayout(n,2048,2048,seed=seed)
+        grid = after.gridSpacing+1
+        before = [PixelRoom(r) for r in after.rooms]
+        index = SpatialHash(grid * max(after.maxWidth,after.maxHeight) + 1)
+        for room in before:
+            index.insert(room)
+        rng = random.Random(seed)
+
+        start = time.perf_counter()
+        for i in range(0,iterations):
+            floatGridStep(before,index,grid,rng)
+        slow = (time.perf_counter() - start) / iterations
+
+        start = time.perf_counter()
+        for i in range(0,iterations):
+            after._gridStep()
+        fast = (time.perf_counter() - start) / iterations
+
+        print('gridstep seedRooms=%-6d pixels=%8.2fms cells=%8.2fms %5.2fx overlaps=%d/%d' %
+              (n,slow * 1000,fast * 1000,slow / fast,
+               len(index.pairs(rectCollideRooms)),
+               len(after.broadphase.pairs(collide_rooms))))
+
+
+def counts(layout):
+    '''
+    How many of each kind of thing the layout holds.
+    '''
+    if layout is None:
+        return {'rooms':0,'mainRooms':0,'halls':0,'voids':0,'edges':0}
+    return {'rooms':len(layout.rooms),
+            'mainRooms':len(layout.mainRooms),
+            'halls':len(layout.halls),
+            'voids':len(layout.voids),
+            'edges':len(layout.edges)}
+
+
+def stages(seedRooms,gridSpacings,sizes,seed=0,separation='grid',halls='box',
+           memory=True,output=None,seeding='uniform'):
+    '''
+    Runs every Pipeline stage for each combination of seedRooms, gridSpacing
+    and size, reporting each stage's time, the peak memory it traced if
+    memory, and how many rooms of each kind there are after it.  Peak memory
+    is measured in a second run since tracing slows everything down.  Every
+    result is also written to output as a line of JSON, if given.
+    '''
+    for n in seedRooms:
+        for g in gridSpacings:
+            for size in sizes:
+                params = {'seedRooms':n,'gridSpacing':g,'size':size,'seed':seed,
+                          'seeding':seeding,'separation':separation,'halls':halls}
+
+                results = []
+                pipeline = Pipeline(size,size,gridSpacing=g,seedRooms=n,
+                                    separation=separation,halls=halls,
+                                    seeding=seeding,seed=seed,keep=False)
+                layout,todo = pipeline.resume()
+                for stage in todo:
+                    start = time.perf_counter()
+                    layout = pipeline.runStage(stage,layout)
+                    elapsed = time.perf_counter() - start
+                    result = dict(params,benchmark='stages',stage=stage,seconds=elapsed)
+                    result.update(counts(layout))
+                    results.append(result)
+                del(layout)
+
+                if memory:
+                    layout,todo = pipeline.resume()
+                    tracemalloc.start()
+                    for stage,result in zip(todo,results):
+                        tracemalloc.reset_peak()
+                        layout = pipeline.runStage(stage,layout)
+                        result['peakBytes'] = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    del(layout)
+
+                for result in results:
+                    if output is not sys.stdout:
+                        print('stages seedRooms=%-6d gridSpacing=%-3d size=%-6d %-10s %9.3fs peak=%9s rooms=%d' %
+                              (n,g,size,result['stage'],result['seconds'],
+                               '%.1fMB' % (result['peakBytes'] / 1e6) if memory else '-',
+                               result['rooms']))
+                    if output is not None:
+                        output.write(json.dumps(result,sort_keys=True) + '\n')
+                if output is not None:
+                    output.flush()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Dungeon generator benchmarks')
+    commands = parser.add_subparsers(dest='benchmark')
+    commands.required = True
+
+    p = commands.add_parser('separation',help='Layout.spreadOutRooms engines')
+    p.add_argument('--seedRooms',type=int,nargs='+',default=[150,1000,5000])
+    p.add_argument('--engines',nargs='+',default=['grid','scatter'])
+    p.add_argument('--limit',type=int,default=2000,
+                   help='give up after this many iterations')
+    p.add_argument('--seed',type=int,default=0)
+    p.add_argument('--seeding',default='uniform',help='uniform or poisson')
+
+    p = commands.add_parser('infill',help='Layout.inFillWithVoids')
+    p.add_argument('--sizes',type=int,nargs='+',default=[1024,4096,16384],
+                   help='dungeon width and height in pixels')
+    p.add_argument('--methods',nargs='+',default=['bitmap','records'],
+                   help='bitmap, records or collide (the original, slow)')
+    p.add_argument('--seedRooms',type=int,default=150)
+    p.add_argument('--seed',type=int,default=0)
+
+    p = commands.add_parser('many',help='Parallel.generate_many throughput')
+    p.add_argument('--count',type=int,default=64)
+    p.add_argument('--workers',type=int,nargs='+',default=[1,2,4])
+    p.add_argument('--seedRooms',type=int,default=150)
+
+    p = commands.add_parser('stages',help='every generation stage over a matrix of sizes')
+    p.add_argument('--seedRooms',type=int,nargs='+',default=[50,150,1000,10000])
+    p.add_argument('--gridSpacings',type=int,nargs='+',default=[8])
+    p.add_argument('--sizes',type=int,nargs='+',default=[1024],
+                   help='dungeon width and height in pixels')
+    p.add_argument('--separation',default='grid')
+    p.add_argument('--halls',default='box')
+    p.add_argument('--seeding',default='uniform',help='uniform or poisson')
+    p.add_argument('--seed',type=int,default=0)
+    p.add_argument('--no-memory',dest='memory',action='store_false',
+                   help="don't measure peak memory, halves the run time")
+    p.add_argument('--output',help='file to append JSON lines of results to, - for stdout')
+
+    p = commands.add_parser('gridstep',help='the separation inner loop on pixels and on grid units')
+    p.add_argument('--seedRooms',type=int,nargs='+',default=[150,1000,5000])
+    p.add_argument('--iterations',type=int,default=20)
+    p.add_argument('--seed',type=int,default=0)
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'separation':
+        separation(args.seedRooms,args.engines,args.limit,args.seed,args.seeding)
+
+    if args.benchmark == 'infill':
+        infill(args.sizes,args.methods,args.seedRooms,args.seed)
+
+    if args.benchmark == 'many':
+        many(args.count,args.workers,args.seedRooms)
+
+    if args.benchmark == 'gridstep':
+        gridstep(args.seedRooms,args.iterations,args.seed)
+
+    if args.benchmark == 'stages':
+        output = None
+        if args.output == '-':
+            output = sys.stdout
+        elif args.output:
+            output = open(args.output,'a')
+        if output is not None:
+            output.write(json.dumps({'benchmark':'environment',
+                                     'python':platform.python_version(),
+                                     'machine':platform.machine(),
+                                     'time':time.time()},sort_keys=True) + '\n')
+        stages(args.seedRooms,args.gridSpacings,args.sizes,args.seed,
+               args.separation,args.halls,args.memory,output,args.seeding)
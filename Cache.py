@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+## An on disk cache of generated dungeons.  Generation is deterministic,
+## so a dungeon is named by a hash of its seed and every parameter given
+## to Layout.generate and only ever has to be generated once.
+##
+##   cache = DungeonCache('/var/cache/dungeons',maxBytes=1<<30)
+##   layout = cache.generate(1024,1024,seed=42)
+##
+## The files are DungeonFile's, so DungeonFile.load(cache.path(key)) maps
+## a cached dungeon without decoding it.
+
+import collections
+import hashlib
+import inspect
+import os
+import tempfile
+
+import DungeonFile
+from Layout import Layout
+
+# bump whenever the generator or the stored format changes, so old
+# entries stop matching instead of coming back stale
+VERSION = 8
+
+_signature = inspect.signature(Layout.generate)
+
+def encode(data):
+    '''
+    Layout.toData() as a DungeonFile.
+    '''
+    return DungeonFile.pack(data)
+
+def decode(blob):
+    return DungeonFile.unpack(blob)
+
+
+class DungeonCache(object):
+
+    SUFFIX = '.dungeon'
+
+    def __init__(self,directory,maxBytes=256<<20,memoryItems=64):
+        '''
+        directory   : where the dungeons are kept, created if missing
+        maxBytes    : the least recently used dungeons are deleted to keep
+                      the directory under this size
+        memoryItems : how many decoded dungeons to also keep in memory
+        '''
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.memoryItems = memoryItems
+        self.memory = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory,exist_ok=True)
+
+        # least recently used first, by access time
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(self.SUFFIX):
+                st = os.stat(os.path.join(directory,name))
+                entries.append((st.st_mtime,name[:-len(self.SUFFIX)],st.st_size))
+        self.files = collections.OrderedDict((key,size) for t,key,size in sorted(entries))
+        self.size = sum(self.files.values())
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self,key):
+        return key in self.memory or key in self.files
+
+    @staticmethod
+    def key(*args,**kwds):
+        '''
+        The name of the dungeon Layout.generate(*args,**kwds) would make,
+        with defaults filled in so equivalent calls share a name.  Only
+        seeded calls can be cached, an rng can't be hashed.  Nor can calls
+        with a separationBudget, how far separation gets in that time
+        depends on the machine.  callbacks don't change the dungeon so
+        they're left out.
+        '''
+        bound = _signature.bind(*args,**kwds)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        params.pop('callbacks')
+        if params.pop('rng') is not None or params['seed'] is None:
+            raise ValueError('only dungeons generated from a seed can be cached')
+        if params['separationBudget'] is not None:
+            raise ValueError("dungeons separated within a separationBudget can't be cached")
+        text = repr((VERSION,sorted(params.items())))
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def path(self,key):
+        return os.path.join(self.directory,key + self.SUFFIX)
+
+    def get(self,key):
+        '''
+        Returns the Layout.toData() stored under key, or None.
+        '''
+        try:
+            data = self.memory[key]
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return data
+        except KeyError:
+            pass
+
+        if key not in self.files:
+            self.misses += 1
+            return None
+
+        try:
+            with open(self.path(key),'rb') as f:
+                data = decode(f.read())
+            os.utime(self.path(key))
+        except Exception:
+            # deleted by another process or damaged, either way gone.  A
+            # damaged file can fail to decode in any number of ways, none
+            # of which should turn a hit into an error
+            self.forget(key)
+            self.misses += 1
+            return None
+
+        self.files.move_to_end(key)
+        self.remember(key,data)
+        self.hits += 1
+        return data
+
+    def put(self,key,data):
+        '''
+        Stores a Layout.toData() under key, evicting old dungeons if over size.
+        '''
+        blob = encode(data)
+        fd,tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd,'wb') as f:
+            f.write(blob)
+        os.replace(tmp,self.path(key))
+
+        self.size -= self.files.pop(key,0)
+        self.files[key] = len(blob)
+        self.size += len(blob)
+        self.remember(key,data)
+        self.evict()
+
+    def remember(self,key,data):
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memoryItems:
+            self.memory.popitem(last=False)
+
+    def forget(self,key):
+        self.memory.pop(key,None)
+        self.size -= self.files.pop(key,0)
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        '''
+        Deletes least recently used dungeons until under maxBytes.
+        '''
+        while self.size > self.maxBytes and len(self.files) > 1:
+            key = next(iter(self.files))
+            self.forget(key)
+
+    def clear(self):
+        for key in list(self.files):
+            self.forget(key)
+        self.memory.clear()
+
+    def generateData(self,*args,**kwds):
+        '''
+        Layout.generate(*args,**kwds).toData(), from the cache if possible.
+        '''
+        key = self.key(*args,**kwds)
+        data = self.get(key)
+        if data is None:
+            data = Layout.generate(*args,**kwds).toData()
+            self.put(key,data)
+        return data
+
+    def generate(self,*args,**kwds):
+        '''
+        Layout.generate(*args,**kwds), from the cache if possible.
+        '''
+        return Layout.fromData(self.generateData(*args,**kwds))
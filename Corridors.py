@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+## Routes hallways between connected main rooms over the grid, instead of
+## turning every void near the two rooms into hall.  Each connection gets a
+## corridor hallwidth cells wide following either an L shape or the
+## cheapest A* path.  Cells that are already hall are cheaper to cross than
+## voids, so corridors share what was carved before them rather than
+## running side by side.
+##
+##   Corridors.route(layout,hallwidth=3,method='astar')
+
+import heapq
+
+from Occupancy import Occupancy
+
+# what it costs to step into a cell
+HALL_COST = 1
+VOID_COST = 3
+ROOM_COST = 8
+
+class CorridorRouter(object):
+    '''
+    The layout's rooms laid over a grid of cells, one per grid unit, built
+    once and shared by every corridor routed.
+    '''
+
+    def __init__(self,layout,hallwidth=3):
+        self.layout = layout
+        self.hallwidth = max(1,hallwidth)
+
+        bx,by,bw,bh = layout.bound
+        pitch = layout.gridSpacing+1
+        # the same grid as Tiles.rasterise
+        self.grid = Occupancy(bx,by,
+                              max(0,-(-(bw - 2) // pitch)),
+                              max(0,-(-(bh - 2) // pitch)),
+                              layout.gridSpacing)
+        self.columns = self.grid.columns
+        self.rows = self.grid.rows
+
+        # the room over each cell, None outside of every room
+        self.owner = [None] * (self.columns * self.rows)
+        for room in layout.rooms:
+            c0,r0,c1,r1 = self.grid.cellsUnder(room.rect)
+            for r in range(r0,r1):
+                i = r * self.columns
+                self.owner[i+c0:i+c1] = [room] * (c1 - c0)
+
+        # search state reused by every A* run, a cell's cost is only valid
+        # if its stamp is the current search's
+        self.cost = [0] * len(self.owner)
+        self.came = [0] * len(self.owner)
+        self.stamp = [0] * len(self.owner)
+        self.search = 0
+
+    def cellOf(self,room):
+        '''
+        The index of the cell under room's center.
+        '''
+        return self.cellAt(*room.center)
+
+    def cellAt(self,x,y):
+        '''
+        The index of the cell under the screen coords x,y, clamped to the grid.
+        '''
+        c = min(max(0,(x - self.grid.x) // self.grid.pitch),self.columns-1)
+        r = min(max(0,(y - self.grid.y) // self.grid.pitch),self.rows-1)
+        return r * self.columns + c
+
+    def stepCost(self,i,ends):
+        '''
+        The cost of stepping into cell i, None if it can't be entered.
+        ends are the rooms being connected, crossing them is free as halls.
+        '''
+        room = self.owner[i]
+        if room is None:
+            return None
+        if room.isHall or room in ends:
+            return HALL_COST
+        if room.isVoid:
+            return VOID_COST
+        return ROOM_COST
+
+    def neighbors(self,i):
+        c = i % self.columns
+        if c > 0:
+            yield i - 1
+        if c < self.columns - 1:
+            yield i + 1
+        if i >= self.columns:
+            yield i - self.columns
+        if i < len(self.owner) - self.columns:
+            yield i + self.columns
+
+    def lshape(self,start,goal,ends):
+        '''
+        The cheaper of the two L shaped paths of cells from start to goal,
+        across then down or down then across.
+        '''
+        w = self.columns
+        c0,r0 = start % w,start // w
+        c1,r1 = goal % w,goal // w
+        dc = 1 if c1 >= c0 else -1
+        dr = 1 if r1 >= r0 else -1
+        across = ([r0 * w + c for c in range(c0,c1+dc,dc)] +
+                  [r * w + c1 for r in range(r0+dr,r1+dr,dr)])
+        down = ([r * w + c0 for r in range(r0,r1+dr,dr)] +
+                [r1 * w + c for c in range(c0+dc,c1+dc,dc)])
+
+        best = None
+        for path in (across,down):
+            costs = [self.stepCost(i,ends) for i in path[1:]]
+            if None in costs:
+                continue
+            if best is None or sum(costs) < best[0]:
+                best = (sum(costs),path)
+        return best[1] if best else self.astar(start,goal,ends)
+
+    def astar(self,start,goal,ends):
+        '''
+        The cheapest path of cells from start to goal, None if there isn't one.
+        '''
+        self.search += 1
+        search = self.search
+        cost,came,stamp = self.cost,self.came,self.stamp
+        w = self.columns
+        gc,gr = goal % w,goal // w
+
+        cost[start] = 0
+        came[start] = start
+        stamp[start] = search
+        frontier = [(0,0,start)]
+        while frontier:
+            f,g,i = heapq.heappop(frontier)
+            if i == goal:
+                path = [i]
+                while i != start:
+                    i = came[i]
+                    path.append(i)
+                path.reverse()
+                return path
+            if g > cost[i]:
+                continue
+            for j in self.neighbors(i):
+                step = self.stepCost(j,ends)
+                if step is None:
+                    continue
+                g2 = g + step
+                if stamp[j] != search or g2 < cost[j]:
+                    stamp[j] = search
+                    cost[j] = g2
+                    came[j] = i
+                    h = (abs(j % w - gc) + abs(j // w - gr)) * HALL_COST
+                    heapq.heappush(frontier,(g2 + h,g2,j))
+        return None
+
+    def carve(self,path):
+        '''
+        Turns the voids within hallwidth of the path into halls.
+        '''
+        layout = self.layout
+        w = self.columns
+        lo = -((self.hallwidth - 1) // 2)
+        hi = self.hallwidth // 2
+        for i in path:
+            c,r = i % w,i // w
+            for rr in range(max(0,r+lo),min(self.rows,r+hi+1)):
+                for cc in range(max(0,c+lo),min(w,c+hi+1)):
+                    room = self.owner[rr * w + cc]
+                    if room is not None and room.isVoid:
+                        layout.setRoomType(room,layout.HALLS)
+
+    def route(self,room,neighbor,method='astar'):
+        '''
+        Routes and carves a corridor between two rooms, returns its cells or
+        None if the rooms can't be reached from each other.
+        '''
+        return self.connect(self.cellOf(room),self.cellOf(neighbor),(room,neighbor),method)
+
+    def connect(self,start,goal,ends=(),method='astar'):
+        '''
+        Routes and carves a corridor between two cells, crossing the ends
+        rooms as if they were halls.  Returns its cells or None.
+        '''
+        if method == 'lshape':
+            path = self.lshape(start,goal,ends)
+        else:
+            path = self.astar(start,goal,ends)
+        if path:
+            self.carve(path)
+        return path
+
+
+def route(layout,hallwidth=3,method='astar'):
+    '''
+    Carves a corridor for every connection between the layout's main rooms,
+    shortest connections first so the longer ones can reuse them.  method
+    is 'astar' or 'lshape'.
+    '''
+    router = CorridorRouter(layout,hallwidth)
+    if not router.owner:
+        return
+    edges = sorted(layout.edges,key=lambda e: (e[0].distance_to(e[1]),e[0].id,e[1].id))
+    for room,neighbor in edges:
+        router.route(room,neighbor,method)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+## Delaunay triangulation and minimum spanning trees for connecting rooms.
+##
+## The triangulation is Bowyer-Watson: points are added one at a time in
+## Hilbert curve order, each one found by walking from the last triangle
+## made and the triangles whose circumcircles contain it replaced by a fan
+## of new ones.  The coherent order keeps the walks and the cavities short
+## so it runs in about O(n log n).  Coordinates should be integers, the
+## predicates are then exact.
+
+def orient(a,b,c):
+    '''
+    Twice the signed area of the triangle abc, positive if counter clockwise.
+    '''
+    return (b[0]-a[0])*(c[1]-a[1]) - (b[1]-a[1])*(c[0]-a[0])
+
+def incircle(a,b,c,d):
+    '''
+    Positive if d is inside the circumcircle of the counter clockwise
+    triangle abc, zero if on it.
+    '''
+    adx,ady = a[0]-d[0],a[1]-d[1]
+    bdx,bdy = b[0]-d[0],b[1]-d[1]
+    cdx,cdy = c[0]-d[0],c[1]-d[1]
+    ad = adx*adx + ady*ady
+    bd = bdx*bdx + bdy*bdy
+    cd = cdx*cdx + cdy*cdy
+    return (adx*(bdy*cd - bd*cdy) -
+            ady*(bdx*cd - bd*cdx) +
+            ad*(bdx*cdy - bdy*cdx))
+
+def hilbert(x,y,order=16):
+    '''
+    Distance along a Hilbert curve filling a 2**order square of the point x,y.
+    '''
+    n = 1 << order
+    d = 0
+    s = n >> 1
+    while s:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x,y = y,x
+        s >>= 1
+    return d
+
+def triangulate(points):
+    '''
+    Returns the Delaunay triangles of points as counter clockwise (i,j,k)
+    index triples.  Duplicate points are ignored and points that are all on
+    a line have no triangles.
+    '''
+    n = len(points)
+    if n < 3:
+        return []
+
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    x0,y0 = min(xs),min(ys)
+    span = max(max(xs) - x0,max(ys) - y0,1)
+
+    # a triangle far enough away that it is outside every circumcircle of
+    # the points, its corners are removed at the end.  Integer points not
+    # on the line through two others are at least 1/span from it, and the
+    # circle through those two and a corner bulges in less than that once
+    # the corner is span**3 away, so no edge of the hull is lost
+    big = 4 * span**3 + 64 * span
+    cx,cy = x0 + span // 2,y0 + span // 2
+    verts = list(points) + [(cx - 2*big,cy - big),(cx + 2*big,cy - big),(cx,cy + 2*big)]
+
+    # triangles are vertex triples with the neighbor opposite each vertex
+    tris = [[n,n+1,n+2]]
+    nbrs = [[None,None,None]]
+    alive = [True]
+
+    scale = max(1,span >> 15) if span >= (1 << 16) else 1
+    order = sorted(range(n),key=lambda i: hilbert((xs[i]-x0)//scale,(ys[i]-y0)//scale))
+
+    last = 0
+    for i in order:
+        p = verts[i]
+
+        # walk towards p from the last triangle made
+        t = last
+        steps = 0
+        while True:
+            a,b,c = tris[t]
+            if orient(verts[b],verts[c],p) < 0:
+                t = nbrs[t][0]
+            elif orient(verts[c],verts[a],p) < 0:
+                t = nbrs[t][1]
+            elif orient(verts[a],verts[b],p) < 0:
+                t = nbrs[t][2]
+            else:
+                break
+            steps += 1
+            if steps > len(tris):
+                # shouldn't happen, but never walk in circles
+                t = next(k for k in range(len(tris)) if alive[k] and
+                         orient(verts[tris[k][1]],verts[tris[k][2]],p) >= 0 and
+                         orient(verts[tris[k][2]],verts[tris[k][0]],p) >= 0 and
+                         orient(verts[tris[k][0]],verts[tris[k][1]],p) >= 0)
+                break
+
+        a,b,c = tris[t]
+        if p == verts[a] or p == verts[b] or p == verts[c]:
+            continue
+
+        # the cavity, triangles whose circumcircles contain p
+        cavity = {t}
+        stack = [t]
+        while stack:
+            k = stack.pop()
+            for m in nbrs[k]:
+                if m is None or m in cavity:
+                    continue
+                a,b,c = tris[m]
+                if incircle(verts[a],verts[b],verts[c],p) > 0:
+                    cavity.add(m)
+                    stack.append(m)
+
+        # fan the cavity's boundary out to p
+        starts = {}
+        ends = {}
+        made = []
+        for k in cavity:
+            alive[k] = False
+            for e in range(0,3):
+                outer = nbrs[k][e]
+                if outer is not None and outer in cavity:
+                    continue
+                b = tris[k][(e+1) % 3]
+                c = tris[k][(e+2) % 3]
+                new = len(tris)
+                tris.append([i,b,c])
+                nbrs.append([outer,None,None])
+                alive.append(True)
+                if outer is not None:
+                    nbrs[outer][nbrs[outer].index(k)] = new
+                starts[b] = new
+                ends[c] = new
+                made.append(new)
+
+        for new in made:
+            _,b,c = tris[new]
+            nbrs[new][1] = starts[c]
+            nbrs[new][2] = ends[b]
+
+        last = made[-1]
+
+    return [tuple(tris[k]) for k in range(len(tris))
+            if alive[k] and max(tris[k]) < n]
+
+def edges(points):
+    '''
+    Returns the edges of the Delaunay triangulation of points as (i,j)
+    index pairs, i < j.
+    '''
+    found = set()
+    for a,b,c in triangulate(points):
+        found.add((min(a,b),max(a,b)))
+        found.add((min(b,c),max(b,c)))
+        found.add((min(c,a),max(c,a)))
+    return sorted(found)
+
+def distance2(p0,p1):
+    return (p1[0]-p0[0])**2 + (p1[1]-p0[1])**2
+
+class DisjointSet(object):
+    '''
+    Union find over the integers 0 to n-1.
+    '''
+    def __init__(self,n):
+        self.parent = list(range(n))
+        self.sets = n
+
+    def find(self,i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self,i,j):
+        i = self.find(i)
+        j = self.find(j)
+        if i == j:
+            return False
+        self.parent[j] = i
+        self.sets -= 1
+        return True
+
+def spanningTree(points,candidates):
+    '''
+    Kruskal's minimum spanning tree of points using the candidate (i,j)
+    edges, weighted by length.  If the candidates don't connect every point
+    the pieces are joined by their shortest connecting edges, so the tree
+    always spans all of the points.  Returns the tree's (i,j) edges.
+    '''
+    n = len(points)
+    sets = DisjointSet(n)
+    tree = []
+    for i,j in sorted(candidates,key=lambda e: (distance2(points[e[0]],points[e[1]]),e)):
+        if sets.union(i,j):
+            tree.append((min(i,j),max(i,j)))
+
+    while sets.sets > 1:
+        # only when the triangulation was degenerate, e.g. points on a line
+        best = None
+        for i in range(n):
+            for j in range(i+1,n):
+                if sets.find(i) != sets.find(j):
+                    d = distance2(points[i],points[j])
+                    if best is None or d < best[0]:
+                        best = (d,i,j)
+        sets.union(best[1],best[2])
+        tree.append((best[1],best[2]))
+
+    return tree
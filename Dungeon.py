@@ -1,77 +1,75 @@
 #!/usr/bin/env python3
 
-import math
-import random
 import pygame
 import pygame.color
 
 ## http://gamasutra.com/blogs/AAdonaac/20150903/252889/Procedural_Dungeon_Generation_Algorithm.php
 
-## utility functions
+## The generation algorithm lives in Layout, which needs no pygame.  Room
+## and Dungeon wrap its records in sprites for drawing.
 
-def roundm(n,m):
-    rnd = lambda x: math.floor((x+m-1)/m)*m
-    try:
-        return [x for x in rnd(n)]
-    except TypeError:
-        return rnd(n)
+from Layout import Layout, RoomRecord
+from Layout import roundm, slope, gridToScreen, screenToGrid
+from Layout import collide_rooms, collide_with_voids, colliderect
+from SpatialHash import SpatialHash
 
-def slope(p0,p1):
-    try:
-        m = (p1[1] - p0[1]) / (p1[0] - p0[0])
-    except ZeroDivisionError:        
-        m = 0
-    return m
-
-def collide_rooms(left,right):
-    '''
-    Collide rooms, allow them to share edges
-    '''
-    if left == right:           # ignore self collisions
-        return False
-    
-    return right.rect.inflate(-2,-2).colliderect(left.rect.inflate(-2,-2))
-
-def collide_and_scatter_rooms(left,right):
-    '''
-    If the rooms collide, apply a velocity to one of them.
-    '''
-    if collide_rooms(left,right):
-        right.repulse(left)
-        return True
-    right.velocity *= 0
-    return False
-
-def gridToScreen(count,spacing):
-    '''
-    Convert grid coordinates (counts) to screen coordinates
-    '''
-    return ((spacing+1)*count)+1
-
-def screenToGrid(coord,spacing):
-    '''
-    Convert screen coordinates to grid coordinates
-    '''
-    return roundm(coord/(spacing+1),spacing)
+## classes
 
-def collide_with_voids(left,right):
+class Atlas(object):
     '''
+    Room images cut from sheets of pre-drawn grid cells, one sheet for
+    each pair of colors and gridSpacing.  Rooms of the same size and
+    colors share an image, so don't draw on them.
     '''
-    return right.isVoid and collide_rooms(left,right)
+    def __init__(self):
+        self.sheets = {}
+        self.images = {}
+
+    def sheet(self,fgcolor,bgcolor,gridSpacing,width,height):
+        '''
+        The sheet of grid cells at least width by height pixels, grown if
+        it isn't already.
+        '''
+        key = (fgcolor,bgcolor,gridSpacing)
+        sheet = self.sheets.get(key)
+        if sheet is not None and sheet.get_width() >= width and sheet.get_height() >= height:
+            return sheet
+
+        pitch = gridSpacing+1
+        if sheet is not None:
+            # grow by at least double so sheets are rarely redrawn
+            width = max(width,sheet.get_width()*2)
+            height = max(height,sheet.get_height()*2)
+        width = gridToScreen(-(-(width-1) // pitch),gridSpacing)
+        height = gridToScreen(-(-(height-1) // pitch),gridSpacing)
+
+        sheet = pygame.Surface((width,height))
+        sheet.fill(bgcolor)
+        for x in range(0,width,pitch):
+            sheet.fill(fgcolor,(x,0,1,height))
+        for y in range(0,height,pitch):
+            sheet.fill(fgcolor,(0,y,width,1))
+        self.sheets[key] = sheet
+        return sheet
+
+    def image(self,fgcolor,bgcolor,gridSpacing,width,height):
+        '''
+        The image of a width by height pixel room, which must be a whole
+        number of grid units, drawn in the given colors.
+        '''
+        key = (fgcolor,bgcolor,gridSpacing,width,height)
+        image = self.images.get(key)
+        if image is None:
+            sheet = self.sheet(fgcolor,bgcolor,gridSpacing,width,height)
+            image = sheet.subsurface((0,0,width,height))
+            self.images[key] = image
+        return image
 
-def snap_rect_to_grid(rect,gridSpacing):
-    '''
-    '''
-    grid = gridSpacing+1
-    rect.x = roundm(rect.x,grid)
-    rect.y = roundm(rect.y,grid)
-    rect.w = roundm(rect.w,grid)
-    rect.h = roundm(rect.h,grid)
 
-## classes
-    
 class Room(pygame.sprite.Sprite):
     _id = 0
+    # where rooms get their images, shared by every room
+    atlas = Atlas()
     @classmethod
     def fromRect(cls,rect,gridSpacing):
         '''
@@ -81,6 +79,13 @@ class Room(pygame.sprite.Sprite):
         r.rect = rect
         return r
 
+    @classmethod
+    def fromRecord(cls,record):
+        '''
+        Create a new room drawing the given RoomRecord.
+        '''
+        return Room(gridSpacing=record.gridSpacing,record=record)
+
     @classmethod
     def nextID(cls):
         '''
@@ -88,35 +93,73 @@ class Room(pygame.sprite.Sprite):
         '''
         i = cls._id
         cls._id += 1
+        return i
 
-    def __init__(self,x=0,y=0,width=1,height=1,gridSpacing=1):
+    def __init__(self,x=0,y=0,width=1,height=1,gridSpacing=1,record=None):
         '''
                  x, y : dungeon surface coords
         width, height : in grid units
           gridSpacing : interior diameter of grid unit
+               record : RoomRecord to draw, created from the above if None
         '''
         super(Room,self).__init__()
 
-        self.id = Room.nextID()
-        
-        self.width       = width
-        self.height      = height        
+        if record is None:
+            record = RoomRecord(Room.nextID(),x,y,width,height,gridSpacing)
+
+        self.record = record
         self.gridSpacing = gridSpacing
-        
-        self.velocity = pygame.math.Vector2(0,0)
 
-        self.image = pygame.Surface((gridToScreen(width,gridSpacing),
-                                     gridToScreen(height,gridSpacing)))
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-        self.neighbors = []
-        self.snapToGrid()
-        self.render()
+        # the surface is only allocated and rendered when first drawn
+        self._image = None
+        self._rendered = None
 
     def __repr__(self):
         return 'Room(%d,%s,velocity=%s)' % (self.id,self.rect,self.velocity)
 
+    @property
+    def id(self):
+        return self.record.id
+
+    @property
+    def width(self):
+        return self.record.width
+
+    @property
+    def height(self):
+        return self.record.height
+
+    @property
+    def neighbors(self):
+        return self.record.neighbors
+
+    @property
+    def center(self):
+        return self.record.center
+
+    @property
+    def rect(self):
+        return pygame.rect.Rect(self.record.rect)
+
+    @rect.setter
+    def rect(self,rect):
+        r = self.record
+        x, y, w, h = rect
+        r.x, r.y = x, y
+        r.width = screenToGrid(w,r.gridSpacing)
+        r.height = screenToGrid(h,r.gridSpacing)
+
+    @property
+    def velocity(self):
+        return pygame.math.Vector2(self.record.vx,self.record.vy)
+
+    @property
+    def image(self):
+        r = self.record
+        if self._rendered != (r.layer,r.w,r.h):
+            self.render()
+        return self._image
+
     @property
     def fgcolor(self):
         return Dungeon.COLORS[self.layer][0]
@@ -127,99 +170,52 @@ class Room(pygame.sprite.Sprite):
 
     @property
     def layer(self):
-        try:
-            return self._layer
-        except AttributeError:
-            self._layer = Dungeon.VOIDS
-        return self._layer
+        return self.record.layer
 
     @layer.setter
     def layer(self,newLayer):
-        self._layer = newLayer
+        self.record.layer = newLayer
 
     @property
     def vector(self):
-        try:
-            return self._vector
-        except AttributeError:
-            self._vector = pygame.math.Vector2(self.rect.center)
-        return self._vector
+        return pygame.math.Vector2(self.record.center)
 
     @property
     def isVoid(self):
-        return self.layer == Dungeon.VOIDS
+        return self.record.isVoid
 
     @property
     def isHall(self):
-        return self.layer == Dungeon.HALLS
+        return self.record.isHall
 
     @property
     def isMainRoom(self):
-        return self.layer == Dungeon.MAIN_ROOMS
+        return self.record.isMainRoom
 
     def centerbox(self,other):
-        x = min(self.rect.x,other.rect.x)
-        y = min(self.rect.y,other.rect.y)
-        w = max(self.rect.x,other.rect.x) - x
-        h = max(self.rect.y,other.rect.y) - y
-        return pygame.rect.Rect(x,y,w,h)
+        return pygame.rect.Rect(self.record.centerbox(other.record))
     
     def distance_to(self,other):
-        return self.vector.distance_to(other.vector)
+        return self.record.distance_to(other.record)
 
     def snapToGrid(self,grid=None):
         '''
         Aligns the room to the specified grid.
         '''
-        if grid is None:
-            grid = self.gridSpacing+1
-        self.rect.x = roundm(self.rect.x,grid)
-        self.rect.y = roundm(self.rect.y,grid)
-
-    def _goodNeighbor(self,other):
-        if (self == other):
-            return False
-        if self.neighbors.count(other) != 0:
-            return False
-        return True
-
-    def pickClosestNeighbors(self,potentials,limit,reset=False):
-        '''
-        potentials: list of Rooms
-             limit: integer specifying upper limit of rooms to pick as neighbors
-             reset: clear out neighbors list before finding more neighbors
-        '''
-        if reset:
-            self.neighbors = []
-
-        # build a neighborhood dictionary keyed on distance between
-        # the target room and the potential neighbors. skip rooms
-        # that aren't good neighbors.
-        
-        neighborhood = {}
-        for p in potentials:
-            if self._goodNeighbor(p):
-                neighborhood.setdefault(self.distance_to(p),p)
-
-        newNeighbors = [neighborhood[d] for d in sorted(neighborhood)][:limit]
-
-        self.neighbors.extend(newNeighbors)
-        
-        return self.neighbors
+        self.record.snapToGrid(grid)
 
     def update(self,time):
-        self.move(time)
-        self.snapToGrid()
+        self.record.update()
 
     def move(self,time):
-        self.rect.x += self.velocity.x
-        self.rect.y += self.velocity.y
+        self.record.move()
 
-    def repulse(self,other):
-        dx = (self.rect.x - other.rect.x)
-        dy = (self.rect.y - other.rect.y)
-        self.velocity.x += dx + random.randint(-10,10) * random.randint(-1,1)
-        self.velocity.y += dy + random.randint(-10,10) * random.randint(-1,1)
+    def repulse(self,other,rng):
+        '''
+        Pushes the room away from other with jitter from rng, the
+        dungeon's layout.rng.
+        '''
+        self.record.repulse(other.record,rng)
 
     def render(self,fgcolor=None,bgcolor=None,width=1):
         '''
@@ -230,27 +226,39 @@ class Room(pygame.sprite.Sprite):
             
         if bgcolor is None:
             bgcolor = self.bgcolor
-            
-        self.image.fill(bgcolor)
 
-        grid = pygame.rect.Rect(0,0,self.gridSpacing+2,self.rect.height)
+        r = self.record
+        self._rendered = (r.layer,r.w,r.h)
+
+        pitch = self.gridSpacing+1
+        if width == 1 and r.w > 1 and r.h > 1 and (r.w-1) % pitch == 0 and (r.h-1) % pitch == 0:
+            self._image = Room.atlas.image(tuple(pygame.Color(fgcolor)),
+                                           tuple(pygame.Color(bgcolor)),
+                                           self.gridSpacing,r.w,r.h)
+            return
+
+        # not a whole number of grid units, or thicker lines, drawn by hand
+        self._image = pygame.Surface((r.w,r.h))
+        self._image.fill(bgcolor)
+
+        grid = pygame.rect.Rect(0,0,self.gridSpacing+2,r.h)
         
-        for grid.x in range(0,self.rect.width,(self.gridSpacing+1)*2):
-            pygame.draw.rect(self.image,fgcolor,grid,width)
+        for grid.x in range(0,r.w,(self.gridSpacing+1)*2):
+            pygame.draw.rect(self._image,fgcolor,grid,width)
 
-        grid = pygame.rect.Rect(0,0,self.rect.width,self.gridSpacing+2)
-        for grid.y in range(0,self.rect.height,(self.gridSpacing+1)*2):
-            pygame.draw.rect(self.image,fgcolor,grid,width)
+        grid = pygame.rect.Rect(0,0,r.w,self.gridSpacing+2)
+        for grid.y in range(0,r.h,(self.gridSpacing+1)*2):
+            pygame.draw.rect(self._image,fgcolor,grid,width)
 
-        pygame.draw.rect(self.image,fgcolor,grid,width)
+        pygame.draw.rect(self._image,fgcolor,grid,width)
 
 
         
 class Dungeon(pygame.sprite.RenderUpdates):
     # room types
-    VOIDS = 0
-    HALLS = 5
-    MAIN_ROOMS=10
+    VOIDS = Layout.VOIDS
+    HALLS = Layout.HALLS
+    MAIN_ROOMS = Layout.MAIN_ROOMS
     
     # default room colors by type
     COLORS = { VOIDS:     ((127,127,127),(0,0,0)), # fg,bg
@@ -258,50 +266,101 @@ class Dungeon(pygame.sprite.RenderUpdates):
                MAIN_ROOMS:((255,255,255),(255,0,0))}
 
     @classmethod
-    def generate(cls,width,height,maxRoomDimension=10,gridSpacing=8,seedRooms=150):
+    def generate(cls,width,height,maxRoomDimension=10,gridSpacing=8,seedRooms=150,
+                 separation='grid',seed=None,rng=None,headless=False,halls='box',
+                 callbacks=None,separationLimit=None,separationBudget=None,seeding='uniform'):
+        '''
+        Creates a new dungeon.  If headless is True, the pygame free Layout
+        is returned instead of a Dungeon.  See Layout.generate for the
+        separation engines, hallway routers, seeding and callbacks.
+        '''
+        layout = Layout.generate(width,height,
+                                 maxRoomDimension,
+                                 gridSpacing,
+                                 seedRooms,
+                                 separation,
+                                 seed,
+                                 rng,
+                                 halls,
+                                 callbacks,
+                                 separationLimit,
+                                 separationBudget,
+                                 seeding)
+        if headless:
+            return layout
+
+        return cls.fromLayout(layout)
+
+    @classmethod
+    def fromLayout(cls,layout):
         '''
-        Creates a new dungeon.
+        Creates a dungeon that draws an existing Layout.
         '''
-        dungeon = cls(width,height,
-                      maxRoomDimension,
-                      maxRoomDimension,
-                      gridSpacing)
-
-        for x in range(0,seedRooms):
-            dungeon.addRandomRoom(dungeon.radius/5) # XXX magic number
-
-        dungeon.spreadOutRooms()
-
-        dungeon.centerIn(pygame.rect.Rect(0,0,dungeon.width,dungeon.height))
-
-        for room in dungeon.pickMainRooms(1.25): # XXX magic number
-            dungeon.setRoomType(room,Dungeon.MAIN_ROOMS)
-            
-        dungeon.inFillWithVoids()
-
-        dungeon.findMainRoomNeighbors()
-
-        dungeon.connectHallsToRooms()
-
-        return dungeon
-        
+        return cls(layout.width,layout.height,
+                   layout.maxWidth,
+                   layout.maxHeight,
+                   layout.gridSpacing,
+                   layout)
     
-    def __init__(self,width,height,maxRoomWidth,maxRoomHeight,gridSpacing=8):
+    def __init__(self,width,height,maxRoomWidth,maxRoomHeight,gridSpacing=8,layout=None,
+                 rng=None):
         '''
         width, height : pixels
         maxRoomWidth  : grid units
         maxRoomHeight : grid units
         gridSpacing   : grid void distance
+        layout        : Layout to draw, a new empty one if None
+        rng           : random.Random for a new layout
         '''
+        super(Dungeon,self).__init__()
+
+        if layout is None:
+            layout = Layout(width,height,maxRoomWidth,maxRoomHeight,gridSpacing,rng)
+
+        self.layout = layout
         self.width = width
         self.height = height
         self.gridSpacing = gridSpacing
         self.rooms = pygame.sprite.LayeredUpdates()
+        self._sprites = {}
 
         self.bgcolor = (80,80,80)
         self.maxWidth = maxRoomWidth
         self.maxHeight = maxRoomHeight
         self.rect = pygame.rect.Rect(0,0,self.width,self.height)
+        self.invalidate()
+        self.sync()
+
+    def invalidate(self):
+        '''
+        Forgets what was drawn, so the next draw redraws everything.
+        '''
+        # (x,y,w,h,layer) of each room as last drawn, by id
+        self._drawn = {}
+        self._drawnBound = None
+        self._target = None
+        self._index = None
+        # the rects the last draw changed, for pygame.display.update
+        self.updated = []
+
+    def sync(self):
+        '''
+        Brings the sprites up to date with the rooms and room types of the
+        layout.  Called after every generation step.
+        '''
+        for record in self.layout.rooms:
+            try:
+                room = self._sprites[record.id]
+            except KeyError:
+                room = Room.fromRecord(record)
+                self._sprites[record.id] = room
+                self.rooms.add(room,layer=record.layer)
+                continue
+            if self.rooms.get_layer_of_sprite(room) != record.layer:
+                self.rooms.change_layer(room,record.layer)
+
+    def spritesFor(self,records):
+        return [self._sprites[r.id] for r in records]
 
     @property
     def font(self):
@@ -314,16 +373,14 @@ class Dungeon(pygame.sprite.RenderUpdates):
 
     @property
     def bound(self):
-        rooms = self.rooms.sprites()
-        if len(rooms):
-            u = rooms[0].rect.unionall([r.rect for r in rooms[1:]])
-        else:
-            u = None
+        u = self.layout.bound
+        if u is not None:
+            u = pygame.rect.Rect(u)
         return u
 
     @property
     def radius(self):
-        return min(self.width,self.height) / 2
+        return self.layout.radius
 
     @property
     def mainRooms(self):
@@ -342,182 +399,234 @@ class Dungeon(pygame.sprite.RenderUpdates):
         Convenience function for moving sprites between layers.
         Assumes room is already a member of self.rooms and not checked.
         '''
+        self.layout.setRoomType(room.record,layer)
         self.rooms.change_layer(room,layer)
-        room.layer = layer
         if render:
             room.render()
 
     def centerIn(self,rect):
-        dx = rect.center[0] - self.bound.center[0]
-        dy = rect.center[1] - self.bound.center[1]
-        for room in self.rooms.sprites():
-            room.rect.x += dx
-            room.rect.y += dy
+        self.layout.centerIn(tuple(rect))
 
     def addRandomRoom(self,radius=None):
         '''
         Creates a new random room in a circle defined by radius whose origin
         is the center of the dungeon.
         '''
-        if radius is None:
-            radius = self.radius
-        
-        w = random.randint(1,self.maxWidth)
-        h = random.randint(1,self.maxHeight)
-        t = 2.0 * math.pi * random.random()
-        u = random.random() + random.random()
-        if u > 1:
-            r = 2 - u
-        else:
-            r = u
-        x = radius * r * math.cos(t) + self.rect.center[0]
-        y = radius * r * math.sin(t) + self.rect.center[1]
-
-        self.rooms.add(Room(x,y,w,h,self.gridSpacing),layer=self.VOIDS)
+        self.layout.addRandomRoom(radius)
+        self.sync()
 
-    def pickMainRooms(self,pickRatio):
+    def pickMainRooms(self,pickRatio,policy='ratio'):
         '''
-        Determines the average width and height of all the rooms in the dungeon.
-        Typically called before inFillWithVoids to avoid skewing the results with
-        a ton of 1x1 rooms.  Rooms who are some pickRatio bigger than average are
-        picked to be "Main" rooms.  Function returns a list of rooms picked.
+        Rooms who are some pickRatio bigger than average are picked to be
+        "Main" rooms, or as policy says, see Layout.pickMainRooms.  Only the
+        sprites of rooms that changed type are moved.  Returns the picked
+        rooms.
         '''
-        rooms = self.rooms.sprites()
-        nrooms = len(rooms)
-
-        pick_w = pickRatio * (sum([r.rect.w for r in rooms]) / nrooms)
-        pick_h = pickRatio * (sum([r.rect.h for r in rooms]) / nrooms)
-
-        for room in rooms:
-            if room.rect.width < pick_w or room.rect.height < pick_h:
-                self.setRoomType(room,Dungeon.VOIDS)
-                continue
-            self.setRoomType(room,Dungeon.MAIN_ROOMS)
-                    
+        changed = []
+        self.layout.pickMainRooms(pickRatio,policy,changed)
+        if len(self._sprites) != len(self.layout.rooms):
+            self.sync()
+        for record in changed:
+            self.rooms.change_layer(self._sprites[record.id],record.layer)
         return self.mainRooms
 
     def findMainRoomNeighbors(self,maxEdges=2):
         '''
-        Tries to connect rooms by picking their maxEdges nearest neighbors.
-        Most of the time this results in a connected graph, but sometimes it
-        doesn't.  A full Delaunay triangulation would result in a fully connected
-        graph. 
+        Connects main rooms to their nearest neighbors, see
+        Layout.findMainRoomNeighbors.
         '''
-        rooms = self.mainRooms
-        for room in rooms:
-            room.pickClosestNeighbors(rooms,maxEdges)
+        self.layout.findMainRoomNeighbors(maxEdges)
+
+    def connectMainRooms(self,loops=0.15):
+        '''
+        Connects every main room through a Delaunay triangulation's minimum
+        spanning tree plus some loops, see Layout.connectMainRooms.
+        '''
+        self.layout.connectMainRooms(loops)
     
-    def connectHallsToRooms(self,hallwidth=3):
+    def connectHallsToRooms(self,hallwidth=3,router='box'):
         '''
         Once main rooms have found their neighbors, we can turn surrounding void
-        rooms into hallways with width "hallwidth".
+        rooms into hallways with width "hallwidth", see Layout.connectHallsToRooms.
         '''
-
-        w =  gridToScreen(hallwidth,self.gridSpacing)
-        
-        for room in self.mainRooms:
-            for neighbor in room.neighbors:
-
-                target = room.centerbox(neighbor)
-
-                collider = Room.fromRect(target.inflate(w,w),self.gridSpacing)
-                collider.snapToGrid()
-
-                outers = pygame.sprite.spritecollide(collider,self.rooms,False,
-                                                     collide_with_voids)
-
-                collider = Room.fromRect(target.inflate(-w,-w),self.gridSpacing)
-                collider.snapToGrid()
-
-                inners = pygame.sprite.spritecollide(collider,self.rooms,False,
-                                                     collide_with_voids)
-
-                for v in outers:
-                    if v in inners and (v.width == 1) and (v.height == 1):
-                        continue
-                    self.setRoomType(v,Dungeon.HALLS)
-                    v.render()
+        self.layout.connectHallsToRooms(hallwidth,router)
+        self.sync()
 
     def inFillWithVoids(self,width=1,height=1,bounds=None):
         '''
-        Fills the bounds rectangle with unit rooms and then collides those
-        rooms with main rooms and other voids.  The unit rooms that collide
-        are removed and the non-colliders are added to the dungeon.
+        Fills the space between rooms with unit void rooms, see
+        Layout.inFillWithVoids.
         '''
-        if bounds is None:
-            bounds = self.bound
+        if bounds is not None:
+            bounds = tuple(bounds)
+        self.layout.inFillWithVoids(width,height,bounds)
+        self.sync()
 
-        voids = pygame.sprite.Group()
-        xfin = bounds.x + bounds.width - (self.gridSpacing+1)
-        yfin = bounds.y + bounds.height - (self.gridSpacing+1)
+    def toTiles(self,bounds=None):
+        '''
+        The dungeon as a numpy tile map, see Layout.toTiles.
+        '''
+        if bounds is not None:
+            bounds = tuple(bounds)
+        return self.layout.toTiles(bounds)
 
-        for x in range(bounds.x,xfin,self.gridSpacing+1):
-            for y in range(bounds.y,yfin,self.gridSpacing+1):
-                r = Room(x,y,gridSpacing=self.gridSpacing)
-                voids.add(r)
+    def graphIndex(self):
+        '''
+        The main room graph indexed for distances and paths, see Graph.
+        '''
+        return self.layout.graphIndex()
 
-        pygame.sprite.groupcollide(voids,self.rooms,True,False,collide_rooms)
+    def toSurface(self,bounds=None):
+        '''
+        A new surface of the dungeon inside the screen rect bounds, by
+        default its bound, drawn from its tile map in one go rather than a
+        room at a time.  Scale it with pygame.transform for thumbnails.
+        Needs numpy.
+        '''
+        import numpy as np
+        from Tiles import EMPTY
 
-        self.rooms.add(voids,layer=Dungeon.VOIDS)
+        if bounds is None:
+            bounds = self.bound
+        bx,by,bw,bh = tuple(bounds)
+        tiles = self.toTiles((bx,by,bw,bh))
+        pitch = self.gridSpacing+1
+
+        # rank the layers in the order they're drawn, the last on top, and
+        # pad with empty cells all round
+        layers = (EMPTY,self.VOIDS,self.HALLS,self.MAIN_ROOMS)
+        rank = np.zeros(256,dtype=np.uint8)
+        rank[list(layers)] = np.arange(len(layers))
+        ranked = np.zeros((tiles.shape[0]+2,tiles.shape[1]+2),dtype=np.uint8)
+        ranked[1:-1,1:-1] = rank[tiles]
+
+        fg = np.array([self.bgcolor] + [self.COLORS[l][0] for l in layers[1:]],dtype=np.uint8)
+        bg = np.array([self.bgcolor] + [self.COLORS[l][1] for l in layers[1:]],dtype=np.uint8)
+
+        # a pixel on a grid line is drawn by the cells on both sides of it,
+        # the top one wins
+        x = np.arange(bw)
+        y = np.arange(bh)
+        right = x // pitch + 1
+        left = np.where(x % pitch == 0,right-1,right)
+        below = y // pitch + 1
+        above = np.where(y % pitch == 0,below-1,below)
+        top = np.maximum(np.maximum(ranked[np.ix_(above,left)],ranked[np.ix_(above,right)]),
+                         np.maximum(ranked[np.ix_(below,left)],ranked[np.ix_(below,right)]))
+
+        lines = (y % pitch == 0)[:,None] | (x % pitch == 0)[None,:]
+        pixels = np.where(lines[...,None],fg[top],bg[top])
+        return pygame.surfarray.make_surface(pixels.transpose(1,0,2))
 
     def stopRooms(self):
         '''
         Zeros the velocity of all rooms in the dungeon.
         '''
-        for room in self.rooms.sprites():
-            room.velocity *= 0
-            room.snapToGrid()        
+        self.layout.stopRooms()
 
-    def spreadOutRooms(self,time=0,surface=None):
+    def spreadOutRooms(self,time=0,surface=None,engine='grid'):
         '''
         Collides rooms with a 'collide and scatter' function that will cause
-        rooms to seperate from one another. 
-        '''
-
-        done = False
-        rooms = self.rooms.sprites()
-
-        while not done:
-            self.rooms.update(time)
-            done = True
-            for room in rooms:
-                room.render()
-                collisions = pygame.sprite.spritecollide(room,rooms,False,
-                                                         collide_and_scatter_rooms)
-                if len(collisions):
-                    if surface:
-                        room.render(bgcolor=(255,0,0))
-                    done = False
-                    break
-
-            if surface and not done:
-                self.draw(surface,True)
-                return False
-
-        self.stopRooms()
-        return True
-            
+        rooms to seperate from one another.  With a surface, one step of the
+        separation is drawn per call and False returned until done.
+        '''
+        if surface is None:
+            return self.layout.spreadOutRooms(engine=engine)
+
+        done = self.layout.spreadOutRooms(1,engine)
+        if not done:
+            self.draw(surface,True)
+        else:
+            self.updated = []
+        return done
 
     def update(self,time):
         '''
         '''
-        self.rooms.update(time)
+        self.layout.update()
         
     def draw(self,surface,drawBounds=True):
         '''
+        Draws the rooms that moved or changed type since the last draw and
+        returns the rects of surface that changed, also kept in
+        self.updated.  Nothing is drawn and [] returned if nothing changed.
+        Everything is redrawn if lots changed or the bound moved.
+        '''
+        if len(self._sprites) != len(self.layout.rooms):
+            self.sync()
+
+        drawn = self._drawn
+        changed = []
+        for record in self.layout.rooms:
+            state = (record.x,record.y,record.w,record.h,record.layer)
+            if drawn.get(record.id) != state:
+                changed.append((record,state))
+
+        bound = self.bound if drawBounds else None
+        if (surface is not self._target or bound != self._drawnBound or
+            len(changed) > len(self.layout.rooms) // 4):
+            return self.drawAll(surface,drawBounds)
+
+        if not changed:
+            self.updated = []
+            return self.updated
+
+        index = self._index
+        rects = []
+        for record,state in changed:
+            old = drawn.get(record.id)
+            if old is not None:
+                rects.append(pygame.rect.Rect(old[:4]))
+            rects.append(pygame.rect.Rect(state[:4]))
+            drawn[record.id] = state
+            index.move(record)
+
+        sprites = self._sprites
+        for rect in rects:
+            surface.set_clip(rect)
+            surface.fill(self.bgcolor,rect)
+            below = [r for r in index.query(rect) if colliderect(rect,r.rect)]
+            for record in sorted(below,key=lambda r: (r.layer,r.id)):
+                surface.blit(sprites[record.id].image,record.rect)
+            if bound is not None:
+                self.drawBound(surface,bound)
+        surface.set_clip(None)
+
+        self.updated = rects
+        return rects
+
+    def drawBound(self,surface,bound):
+        '''
+        Outlines bound just outside it.
+        '''
+        # filled edges rather than pygame.draw.rect, which draws along the
+        # edges of the clip rect when the outline is clipped
+        x,y,w,h = bound.inflate(2,2)
+        for edge in ((x,y,w,1),(x,y+h-1,w,1),(x,y,1,h),(x+w-1,y,1,h)):
+            surface.fill((0,128,0),edge)
+
+    def drawAll(self,surface,drawBounds=True):
+        '''
+        Redraws every room and returns [the surface's rect].
         '''
-    
         surface.fill(self.bgcolor)
 
-        rects = self.rooms.draw(surface)
+        self.rooms.draw(surface)
 
-        if drawBounds:
-            try:
-                pygame.draw.rect(surface,(0,128,0,0.1),self.bound.inflate(2,2),1)
-            except:
-                pass
+        bound = self.bound if drawBounds else None
+        if bound is not None:
+            self.drawBound(surface,bound)
 
-        return rects
+        self._index = SpatialHash(gridToScreen(max(self.maxWidth,self.maxHeight),self.gridSpacing))
+        self._drawn = {}
+        for record in self.layout.rooms:
+            self._drawn[record.id] = (record.x,record.y,record.w,record.h,record.layer)
+            self._index.insert(record)
+        self._drawnBound = bound
+        self._target = surface
+
+        self.updated = [surface.get_rect()]
+        return self.updated
 
 
 if __name__ == '__main__':
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+## A binary file format for finished dungeons that can be used straight
+## from a memory map, without building any room objects.
+##
+##   header : magic, version, width, height, maxWidth, maxHeight,
+##            gridSpacing, room count, edge count, graph node count,
+##            1 if the graph's n*n tables are stored else 0
+##   rooms  : (x, y, width, height, layer, id) per room
+##   edges  : (i, j) per main room connection, indices into rooms
+##   graph  : the Graph.GraphIndex of the main rooms, its ids, offsets,
+##            targets and lengths, then hopCounts, parents and
+##            pathLengths if stored
+##
+## Everything is a little endian 32 bit integer, widths and heights are
+## in grid units and x,y in screen coords, as in Layout.toData(), except
+## the graph's lengths which are 32 bit floats.
+##
+##   with DungeonFile.load('level.dungeon') as dungeon:
+##       x,y,width,height,layer,id = dungeon.room(0)
+##       boss = dungeon.graph().farthest(id)
+
+import mmap
+import struct
+import sys
+from array import array
+
+from Graph import GraphIndex
+
+MAGIC = b'DGN\0'
+VERSION = 3
+
+HEADER = struct.Struct('<4sIiiiiiIIII')
+ROOM = struct.Struct('<6i')
+EDGE = struct.Struct('<2i')
+
+# field order of a room in the file
+X,Y,WIDTH,HEIGHT,LAYER,ID = range(0,6)
+
+def graphTables(graph):
+    # in the order they're stored
+    tables = (graph.ids,graph.offsets,graph.targets,graph.lengths)
+    if graph.dense:
+        tables += (graph.hopCounts,graph.parents,graph.pathLengths)
+    return tables
+
+def pack(data,graph=None,dense=None):
+    '''
+    Packs a Layout.toData() into bytes, with its GraphIndex, which is
+    built from data if not given.  The graph's n*n tables are stored if
+    it has them, see GraphIndex.build for dense.  Storing only the
+    adjacency keeps packing linear in the size of the dungeon.
+    '''
+    rooms = data['rooms']
+    index = dict((room[0],i) for i,room in enumerate(rooms))
+    edges = data['edges']
+    if graph is None or (dense is not None and graph.dense != dense):
+        graph = GraphIndex.fromData(data,dense)
+    tables = [array(table.typecode,table) for table in graphTables(graph)]
+    if sys.byteorder != 'little':
+        for table in tables:
+            table.byteswap()
+
+    out = bytearray(HEADER.size + ROOM.size * len(rooms) + EDGE.size * len(edges) +
+                    sum(len(table) * table.itemsize for table in tables))
+    HEADER.pack_into(out,0,MAGIC,VERSION,
+                     data['width'],data['height'],
+                     data['maxWidth'],data['maxHeight'],
+                     data['gridSpacing'],
+                     len(rooms),len(edges),len(graph),int(graph.dense))
+    offset = HEADER.size
+    for id,x,y,width,height,layer in rooms:
+        ROOM.pack_into(out,offset,x,y,width,height,layer,id)
+        offset += ROOM.size
+    for a,b in edges:
+        EDGE.pack_into(out,offset,index[a],index[b])
+        offset += EDGE.size
+    for table in tables:
+        size = len(table) * table.itemsize
+        out[offset:offset+size] = table.tobytes()
+        offset += size
+    return bytes(out)
+
+def unpack(buffer):
+    '''
+    The Layout.toData() packed in buffer, any bytes like object.
+    '''
+    return MappedDungeon(buffer).toData()
+
+def save(layout,path,graph=None,dense=None):
+    '''
+    Writes a Layout to path, with graph, its GraphIndex, if already built.
+    See pack for dense.
+    '''
+    with open(path,'wb') as f:
+        f.write(pack(layout.toData(),graph,dense))
+
+def load(path):
+    '''
+    Memory maps the dungeon file at path, see MappedDungeon.
+    '''
+    with open(path,'rb') as f:
+        mapped = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+    return MappedDungeon(mapped)
+
+
+class MappedDungeon(object):
+    '''
+    A packed dungeon read in place from a buffer, usually a memory map.
+    The rooms and edges are memoryviews on the buffer with shapes
+    (rooms,6) and (edges,2), indexed like dungeon.rooms[i,X].  Nothing is
+    copied until asked for, graph() included.
+    '''
+
+    def __init__(self,buffer):
+        self.buffer = buffer
+        (magic,version,
+         self.width,self.height,
+         self.maxWidth,self.maxHeight,
+         self.gridSpacing,
+         self.nrooms,self.nedges,self.nnodes,
+         self.dense) = HEADER.unpack_from(buffer,0)
+        if magic != MAGIC:
+            raise ValueError('not a dungeon file')
+        if version != VERSION:
+            raise ValueError('dungeon file version %d, expected %d' % (version,VERSION))
+
+        start = HEADER.size
+        middle = start + ROOM.size * self.nrooms
+        end = middle + EDGE.size * self.nedges
+        n = self.nnodes
+        self._graphAt = end
+        self._graphSizes = (('i',n),('i',n+1),('i',2*self.nedges),('f',2*self.nedges))
+        if self.dense:
+            self._graphSizes += (('i',n*n),('i',n*n),('f',n*n))
+        if len(buffer) < end + 4 * sum(count for code,count in self._graphSizes):
+            raise ValueError('dungeon file is truncated')
+
+        self.view = view = memoryview(buffer)
+        self._views = []
+        self.rooms = self._table(view[start:middle],ROOM,self.nrooms)
+        self.edges = self._table(view[middle:end],EDGE,self.nedges)
+
+    @staticmethod
+    def _table(part,record,count):
+        # a memoryview can't be cast to a shape with a zero in it, so an
+        # empty table, a dungeon without rooms or edges, is unpacked too
+        if sys.byteorder == 'little' and count:
+            return part.cast('i',(count,record.size // 4))
+        return _Unpacked(part,record)
+
+    def __len__(self):
+        return self.nrooms
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def close(self):
+        '''
+        Releases the views and closes the memory map, if there is one.
+        numpy arrays from array() can't be released, while any of them is
+        still around the map stays open, it's closed when the last of them
+        is garbage collected.
+        '''
+        for view in [self.rooms,self.edges] + self._views + [self.view]:
+            if isinstance(view,_Unpacked):
+                view = view.view
+            if isinstance(view,memoryview):
+                view.release()
+        if isinstance(self.buffer,mmap.mmap):
+            try:
+                self.buffer.close()
+            except BufferError:
+                # an array() still views the map, which closes itself
+                # once nothing refers to it
+                pass
+        self.buffer = None
+
+    def room(self,i):
+        '''
+        The i'th room as a tuple (x,y,width,height,layer,id).
+        '''
+        r = self.rooms
+        return (r[i,0],r[i,1],r[i,2],r[i,3],r[i,4],r[i,5])
+
+    def edge(self,i):
+        return (self.edges[i,0],self.edges[i,1])
+
+    def graph(self):
+        '''
+        The GraphIndex of the main rooms, its tables viewing the buffer.
+        Without stored n*n tables its rows are searched for when needed.
+        '''
+        tables = []
+        offset = self._graphAt
+        for code,count in self._graphSizes:
+            part = self.view[offset:offset + 4 * count]
+            if sys.byteorder == 'little':
+                table = part.cast(code)
+                self._views.extend((part,table))
+            else:
+                table = array(code,part.tobytes())
+                table.byteswap()
+                part.release()
+            tables.append(table)
+            offset += 4 * count
+        if not self.dense:
+            return GraphIndex(*tables)
+        ids,offsets,targets,lengths,hopCounts,parents,pathLengths = tables
+        return GraphIndex(ids,offsets,targets,lengths,hopCounts,pathLengths,parents)
+
+    def array(self):
+        '''
+        The rooms as a numpy record array viewing the buffer, with fields
+        x, y, width, height, layer and id.  Needs numpy.  The array keeps a
+        memory map open after close(), copy it to keep the rooms without
+        the map.
+        '''
+        import numpy
+        dtype = numpy.dtype([('x','<i4'),('y','<i4'),('width','<i4'),
+                             ('height','<i4'),('layer','<i4'),('id','<i4')])
+        return numpy.frombuffer(self.buffer,dtype,self.nrooms,HEADER.size)
+
+    def toData(self):
+        '''
+        A Layout.toData() copy of the dungeon.
+        '''
+        rooms = [self.room(i) for i in range(0,self.nrooms)]
+        return {'width':self.width,
+                'height':self.height,
+                'maxWidth':self.maxWidth,
+                'maxHeight':self.maxHeight,
+                'gridSpacing':self.gridSpacing,
+                'rooms':[(id,x,y,width,height,layer) for x,y,width,height,layer,id in rooms],
+                'edges':[(rooms[a][ID],rooms[b][ID]) for a,b in
+                         (self.edge(i) for i in range(0,self.nedges))]}
+
+    def toLayout(self):
+        '''
+        Builds a Layout from the dungeon.
+        '''
+        from Layout import Layout
+        return Layout.fromData(self.toData())
+
+
+class _Unpacked(object):
+    '''
+    Stands in for a shaped memoryview on big endian machines, where the
+    file's ints can't be viewed directly, and for empty tables, which
+    can't be shaped.
+    '''
+    def __init__(self,view,record):
+        self.view = view
+        self.record = record
+
+    def __getitem__(self,index):
+        i,j = index
+        return self.record.unpack_from(self.view,i * self.record.size)[j]
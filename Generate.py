@@ -59,8 +59,9 @@ class GameMode(State):
         self.dispatch_events()
         self.dispatch_pressed()
         self.game.update()
-        self.game.draw()
-        pygame.display.update()
+        rects = self.game.draw()
+        if rects:
+            pygame.display.update(rects)
 
 
 class InitializationMode(GameMode):
@@ -100,7 +101,8 @@ class CollideRoomsMode(GameMode):
         self.dispatch_events()
         self.dispatch_pressed()
         self.done = self.game.dungeon.spreadOutRooms(self.game.time,self.screen)
-        pygame.display.update()
+        if self.game.dungeon.updated:
+            pygame.display.update(self.game.dungeon.updated)
     
     def enterAction(self):
         super(CollideRoomsMode,self).enterAction()
@@ -148,22 +150,26 @@ class MainRoomNeighborsMode(GameMode):
         self.dispatch_events()
         self.dispatch_pressed()
         self.game.update()
-        self.game.draw()
-
-        for room in self.game.dungeon.mainRooms:
-            for neighbor in room.neighbors:
-                pygame.draw.line(self.game.screen, (0,127,0),
-                                 room.rect.center,
-                                 neighbor.rect.center,
-                                 3)
-        pygame.display.update()
+        rects = self.game.draw()
+
+        # the lines only need drawing again if the rooms under them were
+        if rects or not self.linesDrawn:
+            for room in self.game.dungeon.mainRooms:
+                for neighbor in room.neighbors:
+                    pygame.draw.line(self.game.screen, (0,127,0),
+                                     room.center,
+                                     neighbor.center,
+                                     3)
+            pygame.display.update()
+            self.linesDrawn = True
         self.elapsed += self.game.time
 
     
     def enterAction(self):
         super(MainRoomNeighborsMode,self).enterAction()
-        self.game.dungeon.findMainRoomNeighbors()
+        self.game.dungeon.connectMainRooms()
         self.elapsed = self.game.time
+        self.linesDrawn = False
     
     def checkConditions(self):
         if self.reset:
@@ -185,6 +191,8 @@ class LocateHallwaysMode(GameMode):
     def enterAction(self):
         super(LocateHallwaysMode,self).enterAction()
         self.game.dungeon.connectHallsToRooms()
+        # wipe the neighbor lines
+        self.game.dungeon.invalidate()
 
     def checkConditions(self):
         if self.reset:
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+
+## The main room graph indexed once, so gameplay code can ask how far
+## apart two rooms are, or which room is farthest from the entrance,
+## without searching the graph itself every time.
+##
+## Nodes are numbered 0..n-1 in main room order.  The adjacency is stored
+## in compressed sparse row form, node i's neighbors are
+## targets[offsets[i]:offsets[i+1]] at lengths[...] apart.  Searching from
+## a source gives its row of hopCounts, pathLengths and parents: the
+## fewest edges to each node, the shortest Euclidean distance between
+## room centers along the edges, and the previous node on that shortest
+## path, which makes the row the shortest path tree from the source.
+## Unreachable entries are -1, inf and -1.
+##
+## Graphs of up to DENSE_LIMIT nodes are searched from every source when
+## indexed and keep all the rows in n*n row major tables, 12 bytes an
+## entry.  Bigger graphs only keep their adjacency and search from a
+## source the first time it's asked about, keeping the ROWS most recently
+## used rows, so indexing them is linear in time and space.  Everything
+## is an array, or a memoryview of a DungeonFile.
+##
+##   graph = layout.graphIndex()
+##   boss = graph.farthest(entrance.id)
+##   graph.path(entrance.id,boss)
+
+import collections
+import heapq
+import math
+from array import array
+
+INF = float('inf')
+
+class GraphIndex(object):
+
+    # the most nodes indexed with every row up front, 256 nodes take about
+    # 0.2s and 0.8MB
+    DENSE_LIMIT = 256
+    # how many rows a bigger graph keeps once searched
+    ROWS = 64
+
+    def __init__(self,ids,offsets,targets,lengths,hopCounts=None,pathLengths=None,parents=None):
+        '''
+        Wraps tables already built, see build.  Without hopCounts,
+        pathLengths and parents the rows are searched for when needed.
+        '''
+        self.ids = ids
+        self.offsets = offsets
+        self.targets = targets
+        self.lengths = lengths
+        self.hopCounts = hopCounts
+        self.pathLengths = pathLengths
+        self.parents = parents
+        self.n = len(ids)
+        self.index = dict((id,i) for i,id in enumerate(ids))
+        self._rows = collections.OrderedDict()
+        self._diameter = None
+
+    @property
+    def dense(self):
+        '''
+        True if every row is kept in the n*n tables.
+        '''
+        return self.hopCounts is not None
+
+    @classmethod
+    def build(cls,ids,centers,edges,dense=None):
+        '''
+        Indexes the graph with nodes ids at centers and edges, pairs of
+        node indices.  If dense, or dense is None and there are at most
+        DENSE_LIMIT nodes, every node is searched from now, otherwise
+        only when asked about.
+        '''
+        n = len(ids)
+        adjacent = [[] for i in range(0,n)]
+        for i,j in edges:
+            length = math.hypot(centers[i][0]-centers[j][0],centers[i][1]-centers[j][1])
+            adjacent[i].append((j,length))
+            adjacent[j].append((i,length))
+
+        offsets = array('i',[0])
+        targets = array('i')
+        lengths = array('f')
+        for neighbors in adjacent:
+            neighbors.sort()
+            for j,length in neighbors:
+                targets.append(j)
+                lengths.append(length)
+            offsets.append(len(targets))
+
+        if dense is None:
+            dense = n <= cls.DENSE_LIMIT
+        if not dense:
+            return cls(array('i',ids),offsets,targets,lengths)
+
+        hopCounts = array('i',[-1]) * (n*n)
+        pathLengths = array('f',[INF]) * (n*n)
+        parents = array('i',[-1]) * (n*n)
+        for source in range(0,n):
+            row = source*n
+            cls._breadthFirst(source,row,offsets,targets,hopCounts)
+            cls._dijkstra(source,row,offsets,targets,lengths,pathLengths,parents)
+
+        return cls(array('i',ids),offsets,targets,lengths,hopCounts,pathLengths,parents)
+
+    @classmethod
+    def fromLayout(cls,layout,dense=None):
+        '''
+        Indexes the layout's main rooms and the edges between them.
+        '''
+        rooms = layout.mainRooms
+        index = dict((room.id,i) for i,room in enumerate(rooms))
+        edges = [(index[a.id],index[b.id]) for a,b in layout.edges]
+        return cls.build([r.id for r in rooms],[r.center for r in rooms],edges,dense)
+
+    @classmethod
+    def fromData(cls,data,dense=None):
+        '''
+        Indexes the main rooms and edges of a Layout.toData().
+        '''
+        from Layout import Layout, gridToScreen
+        g = data['gridSpacing']
+        ids = []
+        centers = []
+        for id,x,y,width,height,layer in data['rooms']:
+            if layer == Layout.MAIN_ROOMS:
+                ids.append(id)
+                centers.append((x + gridToScreen(width,g)//2,y + gridToScreen(height,g)//2))
+        index = dict((id,i) for i,id in enumerate(ids))
+        edges = [(index[a],index[b]) for a,b in data['edges']]
+        return cls.build(ids,centers,edges,dense)
+
+    def row(self,source):
+        '''
+        The hopCounts, pathLengths and parents tables holding node
+        source's row, and where in them it starts.
+        '''
+        if self.hopCounts is not None:
+            return self.hopCounts,self.pathLengths,self.parents,source*self.n
+        try:
+            tables = self._rows[source]
+            self._rows.move_to_end(source)
+            return tables
+        except KeyError:
+            pass
+        n = self.n
+        hopCounts = array('i',[-1]) * n
+        pathLengths = array('f',[INF]) * n
+        parents = array('i',[-1]) * n
+        self._breadthFirst(source,0,self.offsets,self.targets,hopCounts)
+        self._dijkstra(source,0,self.offsets,self.targets,self.lengths,pathLengths,parents)
+        tables = self._rows[source] = (hopCounts,pathLengths,parents,0)
+        while len(self._rows) > self.ROWS:
+            self._rows.popitem(last=False)
+        return tables
+
+    @staticmethod
+    def _breadthFirst(source,row,offsets,targets,hopCounts):
+        hopCounts[row+source] = 0
+        frontier = [source]
+        hops = 0
+        while frontier:
+            hops += 1
+            found = []
+            for i in frontier:
+                for k in range(offsets[i],offsets[i+1]):
+                    j = targets[k]
+                    if hopCounts[row+j] < 0:
+                        hopCounts[row+j] = hops
+                        found.append(j)
+            frontier = found
+
+    @staticmethod
+    def _dijkstra(source,row,offsets,targets,lengths,pathLengths,parents):
+        best = {source:0.0}
+        done = set()
+        heap = [(0.0,source,source)]
+        while heap:
+            d,i,parent = heapq.heappop(heap)
+            if i in done:
+                continue
+            done.add(i)
+            pathLengths[row+i] = d
+            if i != source:
+                parents[row+i] = parent
+            for k in range(offsets[i],offsets[i+1]):
+                j = targets[k]
+                dj = d + lengths[k]
+                if j not in done and dj < best.get(j,INF):
+                    best[j] = dj
+                    heapq.heappush(heap,(dj,j,i))
+
+    def __len__(self):
+        return self.n
+
+    def neighbors(self,id):
+        '''
+        The room ids joined to room id by an edge.
+        '''
+        i = self.index[id]
+        return [self.ids[self.targets[k]] for k in range(self.offsets[i],self.offsets[i+1])]
+
+    def hops(self,a,b):
+        '''
+        The fewest edges between rooms a and b, -1 if b can't be reached.
+        '''
+        hopCounts,pathLengths,parents,row = self.row(self.index[a])
+        return hopCounts[row + self.index[b]]
+
+    def distance(self,a,b):
+        '''
+        The shortest distance between the centers of rooms a and b along
+        the edges, inf if b can't be reached.
+        '''
+        hopCounts,pathLengths,parents,row = self.row(self.index[a])
+        return pathLengths[row + self.index[b]]
+
+    def path(self,a,b):
+        '''
+        The room ids along the shortest path from a to b, both included,
+        [] if b can't be reached.
+        '''
+        hopCounts,pathLengths,parents,row = self.row(self.index[a])
+        j = self.index[b]
+        if pathLengths[row+j] == INF:
+            return []
+        path = [j]
+        while parents[row+j] >= 0:
+            j = parents[row+j]
+            path.append(j)
+        return [self.ids[i] for i in reversed(path)]
+
+    def farthest(self,a):
+        '''
+        The room id farthest along the edges from room a, of those that
+        can be reached.
+        '''
+        hopCounts,pathLengths,parents,row = self.row(self.index[a])
+        far = self.index[a]
+        for j in range(0,self.n):
+            d = pathLengths[row+j]
+            if d != INF and d > pathLengths[row+far]:
+                far = j
+        return self.ids[far]
+
+    @property
+    def diameter(self):
+        '''
+        The longest shortest path as (distance,a,b), (0,None,None) for an
+        empty graph.  A graph without the n*n tables is searched from
+        every node for it, once.
+        '''
+        if self._diameter is None:
+            n = self.n
+            best = (0.0,None,None)
+            for i in range(0,n):
+                hopCounts,lengths,parents,row = self.row(i)
+                for j in range(i,n):
+                    d = lengths[row+j]
+                    if d != INF and (best[1] is None or d > best[0]):
+                        best = (d,self.ids[i],self.ids[j])
+            self._diameter = best
+        return self._diameter
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+## Callbacks for Layout.generate and Pipeline that collect the record each
+## stage reports as it finishes, see Pipeline for what is in a record.
+##
+##   recorder = Recorder()
+##   layout = Layout.generate(1024,1024,seed=42,callbacks=[recorder])
+##   recorder.write(open('stages.jsonl','a'))
+
+import json
+import logging
+
+class Recorder(object):
+    '''
+    Keeps every record it's called with, for exporting or summing later.
+    '''
+
+    def __init__(self,**tags):
+        '''
+        tags are added to every record, e.g. a host name or version.
+        '''
+        self.tags = tags
+        self.records = []
+
+    def __call__(self,record):
+        self.records.append(dict(record,**self.tags))
+
+    def __len__(self):
+        return len(self.records)
+
+    def clear(self):
+        self.records = []
+
+    def totals(self):
+        '''
+        The numbers in the records summed per stage, as a dict of stage name
+        to dict.  Counts of rooms are left out since they aren't work done.
+        '''
+        skip = ('rooms','mainRooms','halls','voids','seed')
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'],{})
+            for name,value in record.items():
+                if name in skip or isinstance(value,bool) or not isinstance(value,(int,float)):
+                    continue
+                total[name] = total.get(name,0) + value
+        return totals
+
+    def write(self,f):
+        '''
+        Writes the records to the file f as lines of JSON.
+        '''
+        for record in self.records:
+            f.write(json.dumps(record,sort_keys=True) + '\n')
+
+
+class LogRecords(object):
+    '''
+    Logs a line for every record, at level on logger.
+    '''
+
+    def __init__(self,logger=None,level=logging.INFO):
+        self.logger = logger or logging.getLogger('dungeon')
+        self.level = level
+
+    def __call__(self,record):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level,'%s %s',record['stage'],
+                            ' '.join('%s=%s' % (k,record[k]) for k in sorted(record) if k != 'stage'))
+
+
+class Slowest(object):
+    '''
+    Calls report with any record of a stage that took longer than seconds,
+    for catching the occasional slow generation in production.
+    '''
+
+    def __init__(self,seconds,report):
+        self.seconds = seconds
+        self.report = report
+
+    def __call__(self,record):
+        if record['seconds'] > self.seconds:
+            self.report(record)
@@ -0,0 +1,1074 @@
+#!/usr/bin/env python3
+
+import collections
+import math
+import operator
+import random
+import time
+
+import Corridors
+import Delaunay
+import Graph
+from Occupancy import Occupancy
+from SpatialHash import SpatialHash
+
+## http://gamasutra.com/blogs/AAdonaac/20150903/252889/Procedural_Dungeon_Generation_Algorithm.php
+
+## Pure data dungeon generation, no pygame required. Rooms are compact
+## records and rects are plain (x,y,w,h) tuples in screen coordinates.
+## The pygame Dungeon and Room classes are views on top of a Layout.
+
+## utility functions
+
+def roundm(n,m):
+    '''
+    Rounds n up to a multiple of the integer m, in integer arithmetic.  A
+    fractional n is floored first, as the original float formula
+    floor((n+m-1)/m)*m did.
+    '''
+    if type(n) is not int:
+        n = math.floor(n)
+    return -(-n // m) * m
+
+def slope(p0,p1):
+    try:
+        m = (p1[1] - p0[1]) / (p1[0] - p0[0])
+    except ZeroDivisionError:
+        m = 0
+    return m
+
+def gridToScreen(count,spacing):
+    '''
+    Convert grid coordinates (counts) to screen coordinates
+    '''
+    return ((spacing+1)*count)+1
+
+def screenToGrid(coord,spacing):
+    '''
+    Convert screen coordinates to grid coordinates (counts), the inverse
+    of gridToScreen, rounding down.
+    '''
+    return (coord - 1) // (spacing+1)
+
+def inflate(rect,dx,dy):
+    '''
+    Grow or shrink rect about its center, same semantics as pygame.Rect.inflate.
+    '''
+    x,y,w,h = rect
+    # halved rounding towards zero, as pygame does
+    hx = dx // 2 if dx >= 0 else -(-dx // 2)
+    hy = dy // 2 if dy >= 0 else -(-dy // 2)
+    return (x - hx,y - hy,w + dx,h + dy)
+
+def extents(rect):
+    '''
+    Returns the (left,top,right,bottom) of rect with negative sizes normalized,
+    or None if rect has no area.
+    '''
+    x,y,w,h = rect
+    if not (w and h):
+        return None
+    return (min(x,x+w),min(y,y+h),max(x,x+w),max(y,y+h))
+
+def colliderect(a,b):
+    '''
+    True if the rects a and b overlap, same semantics as pygame.Rect.colliderect.
+    '''
+    a = extents(a)
+    b = extents(b)
+    if a is None or b is None:
+        return False
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def unionall(rects):
+    '''
+    Returns the rect bounding all the rects, or None if there aren't any.
+    '''
+    if not len(rects):
+        return None
+    x0 = min(r[0] for r in rects)
+    y0 = min(r[1] for r in rects)
+    x1 = max(r[0]+r[2] for r in rects)
+    y1 = max(r[1]+r[3] for r in rects)
+    return (x0,y0,x1-x0,y1-y0)
+
+def center(rect):
+    x,y,w,h = rect
+    return (x + w//2,y + h//2)
+
+def collide_rooms(left,right):
+    '''
+    Collide rooms, allow them to share edges
+    '''
+    if left is right:           # ignore self collisions
+        return False
+
+    try:
+        # room records, in grid units where sharing an edge isn't overlapping
+        ax,ay = left.gx,left.gy
+        bx,by = right.gx,right.gy
+        return (ax < bx+right.width and bx < ax+left.width and
+                ay < by+right.height and by < ay+left.height)
+    except AttributeError:
+        ax,ay,aw,ah = left.rect
+        bx,by,bw,bh = right.rect
+    if aw > 2 and ah > 2 and bw > 2 and bh > 2:
+        # the common case, both rects shrunk by a pixel on each side
+        return ax < bx+bw-2 and bx < ax+aw-2 and ay < by+bh-2 and by < ay+ah-2
+
+    return colliderect(inflate(left.rect,-2,-2),inflate(right.rect,-2,-2))
+
+def collide_with_voids(left,right):
+    '''
+    '''
+    return right.isVoid and collide_rooms(left,right)
+
+def snap_rect_to_grid(rect,gridSpacing):
+    '''
+    Returns rect with its position and size aligned to the grid.
+    '''
+    grid = gridSpacing+1
+    return tuple(roundm(v,grid) for v in rect)
+
+## classes
+
+class RoomRecord(object):
+    '''
+    A room reduced to the data needed to generate a dungeon.  Its geometry
+    is kept in whole grid units, pixels are only worked out when asked for.
+
+       gx, gy : top left corner in grid units
+    width, height : in grid units
+         x, y : dungeon surface coords, gx and gy times the grid pitch
+         w, h : dungeon surface size
+       vx, vy : velocity in grid units
+    '''
+    __slots__ = ('id','gx','gy','width','height','gridSpacing',
+                 'layer','vx','vy','neighbors')
+
+    def __init__(self,id,x=0,y=0,width=1,height=1,gridSpacing=1,layer=0):
+        '''
+        x and y are dungeon surface coords, snapped up to the grid.
+        '''
+        self.id = id
+        self.width = width
+        self.height = height
+        self.gridSpacing = gridSpacing
+        self.x = x
+        self.y = y
+        self.layer = layer
+        self.vx = 0
+        self.vy = 0
+        self.neighbors = []
+
+    @classmethod
+    def fromData(cls,id,x,y,width,height,gridSpacing,layer):
+        '''
+        A room as saved by Layout.toData, whose x and y are on the grid.
+        '''
+        grid = gridSpacing+1
+        room = cls.__new__(cls)
+        room.id = id
+        room.gx = x // grid
+        room.gy = y // grid
+        room.width = width
+        room.height = height
+        room.gridSpacing = gridSpacing
+        room.layer = layer
+        room.vx = 0
+        room.vy = 0
+        room.neighbors = []
+        return room
+
+    def __repr__(self):
+        return 'RoomRecord(%d,%s,layer=%d)' % (self.id,self.rect,self.layer)
+
+    @property
+    def x(self):
+        return self.gx * (self.gridSpacing+1)
+
+    @x.setter
+    def x(self,x):
+        grid = self.gridSpacing+1
+        self.gx = roundm(x,grid) // grid
+
+    @property
+    def y(self):
+        return self.gy * (self.gridSpacing+1)
+
+    @y.setter
+    def y(self,y):
+        grid = self.gridSpacing+1
+        self.gy = roundm(y,grid) // grid
+
+    @property
+    def w(self):
+        return gridToScreen(self.width,self.gridSpacing)
+
+    @property
+    def h(self):
+        return gridToScreen(self.height,self.gridSpacing)
+
+    @property
+    def cells(self):
+        '''
+        The room's (gx,gy,width,height) in grid units.
+        '''
+        return (self.gx,self.gy,self.width,self.height)
+
+    @property
+    def rect(self):
+        grid = self.gridSpacing+1
+        return (self.gx * grid,self.gy * grid,
+                self.width * grid + 1,self.height * grid + 1)
+
+    @property
+    def center(self):
+        x,y,w,h = self.rect
+        return (x + w//2,y + h//2)
+
+    @property
+    def isVoid(self):
+        return self.layer == Layout.VOIDS
+
+    @property
+    def isHall(self):
+        return self.layer == Layout.HALLS
+
+    @property
+    def isMainRoom(self):
+        return self.layer == Layout.MAIN_ROOMS
+
+    def centerbox(self,other):
+        x = min(self.x,other.x)
+        y = min(self.y,other.y)
+        w = max(self.x,other.x) - x
+        h = max(self.y,other.y) - y
+        return (x,y,w,h)
+
+    def distance_to(self,other):
+        x0,y0 = self.center
+        x1,y1 = other.center
+        return math.hypot(x1 - x0,y1 - y0)
+
+    def snapToGrid(self,grid=None):
+        '''
+        Aligns the room to the specified grid.  Rooms are always on their
+        own grid, so this only moves them for some other grid.
+        '''
+        if grid is None:
+            return
+        self.x = roundm(self.x,grid)
+        self.y = roundm(self.y,grid)
+
+    def _goodNeighbor(self,other):
+        if self is other:
+            return False
+        if self.neighbors.count(other) != 0:
+            return False
+        return True
+
+    def pickClosestNeighbors(self,potentials,limit,reset=False):
+        '''
+        potentials: list of rooms
+             limit: integer specifying upper limit of rooms to pick as neighbors
+             reset: clear out neighbors list before finding more neighbors
+        '''
+        if reset:
+            self.neighbors = []
+
+        # build a neighborhood dictionary keyed on distance between
+        # the target room and the potential neighbors. skip rooms
+        # that aren't good neighbors.
+
+        neighborhood = {}
+        for p in potentials:
+            if self._goodNeighbor(p):
+                neighborhood.setdefault(self.distance_to(p),p)
+
+        newNeighbors = [neighborhood[d] for d in sorted(neighborhood)][:limit]
+
+        self.neighbors.extend(newNeighbors)
+
+        return self.neighbors
+
+    def update(self):
+        self.move()
+
+    def move(self):
+        self.gx += int(round(self.vx))
+        self.gy += int(round(self.vy))
+
+    def stop(self):
+        self.vx = 0
+        self.vy = 0
+
+    def repulse(self,other,rng):
+        self.push(self.gx - other.gx,self.gy - other.gy,rng)
+
+    def push(self,dx,dy,rng):
+        '''
+        Adds dx,dy grid units plus a grid unit of jitter from rng to the
+        room's velocity.  rng is the layout's, so the jitter comes out the
+        same for the same seed.
+        '''
+        self.vx += dx + rng.randint(-1,1)
+        self.vy += dy + rng.randint(-1,1)
+
+
+class Layout(object):
+    # room types
+    VOIDS = 0
+    HALLS = 5
+    MAIN_ROOMS=10
+
+    @classmethod
+    def generate(cls,width,height,maxRoomDimension=10,gridSpacing=8,seedRooms=150,
+                 separation='grid',seed=None,rng=None,halls='box',callbacks=None,
+                 separationLimit=None,separationBudget=None,seeding='uniform'):
+        '''
+        Creates a new dungeon layout.  seeding is how the rooms are first
+        dropped, 'uniform' piles them up with addRandomRoom and 'poisson'
+        lays them out apart with addPoissonRooms.  separation picks the
+        engine used by spreadOutRooms, with separationLimit and
+        separationBudget its limit and budget, and halls the router used by
+        connectHallsToRooms.
+        Every random choice is made by rng, a random.Random seeded with seed
+        if not given, so the same seed and parameters always generate the
+        same layout.  callbacks are called with a record of each stage as it
+        finishes, see Pipeline.  See Pipeline for running the stages one at
+        a time too.
+        '''
+        # the stages live in Pipeline, which can also resume from snapshots
+        from Pipeline import Pipeline
+        return Pipeline(width,height,
+                        maxRoomDimension,
+                        gridSpacing,
+                        seedRooms,
+                        separation,
+                        halls=halls,
+                        seed=seed,
+                        rng=rng,
+                        keep=False,
+                        callbacks=callbacks,
+                        separationLimit=separationLimit,
+                        separationBudget=separationBudget,
+                        seeding=seeding).run()
+
+    def __init__(self,width,height,maxRoomWidth,maxRoomHeight,gridSpacing=8,rng=None):
+        '''
+        width, height : pixels
+        maxRoomWidth  : grid units
+        maxRoomHeight : grid units
+        gridSpacing   : grid void distance
+        rng           : random.Random used by every step, a new unseeded
+                        one if None
+        '''
+        if rng is None:
+            rng = random.Random()
+
+        self.rng = rng
+        self.width = width
+        self.height = height
+        self.gridSpacing = gridSpacing
+        self.rooms = []
+
+        self.maxWidth = maxRoomWidth
+        self.maxHeight = maxRoomHeight
+        self.rect = (0,0,self.width,self.height)
+        self._nextID = 0
+        self._broadphase = None
+        self._restless = None
+        self.occupancy = None
+        # running totals of work done, e.g. separationSteps, see Pipeline
+        self.counters = collections.Counter()
+        # the overlap after each iteration of the bounded engine
+        self.separationHistory = []
+
+    def toData(self):
+        '''
+        The layout as plain dicts, lists and tuples of ints, small to pickle
+        and free of pygame.  Rooms are (id,x,y,width,height,layer) with
+        width and height in grid units, edges are pairs of room ids.
+        '''
+        return {'width':self.width,
+                'height':self.height,
+                'maxWidth':self.maxWidth,
+                'maxHeight':self.maxHeight,
+                'gridSpacing':self.gridSpacing,
+                'rooms':[(r.id,r.x,r.y,r.width,r.height,r.layer) for r in self.rooms],
+                'edges':[(r.id,n.id) for r,n in self.edges]}
+
+    @classmethod
+    def fromData(cls,data):
+        '''
+        Rebuilds a layout from toData's output.
+        '''
+        layout = cls(data['width'],data['height'],
+                     data['maxWidth'],data['maxHeight'],
+                     data['gridSpacing'])
+        gridSpacing = layout.gridSpacing
+        restore = RoomRecord.fromData
+        layout.rooms = [restore(id,x,y,width,height,gridSpacing,layer)
+                        for id,x,y,width,height,layer in data['rooms']]
+        byID = dict((room.id,room) for room in layout.rooms)
+        for a,b in data['edges']:
+            byID[a].neighbors.append(byID[b])
+            byID[b].neighbors.append(byID[a])
+        layout._nextID = max(byID) + 1 if byID else 0
+        return layout
+
+    def graphIndex(self,dense=None):
+        '''
+        The main rooms and their connections indexed for distance and path
+        queries, see Graph.  dense as for GraphIndex.build.
+        '''
+        return Graph.GraphIndex.fromLayout(self,dense)
+
+    def toTiles(self,bounds=None):
+        '''
+        The layout as a uint8 numpy array of tiles in grid units, each the
+        layer of the room over it, see Tiles.  Needs numpy.
+        '''
+        import Tiles
+        return Tiles.rasterise(self,bounds)
+
+    @property
+    def bound(self):
+        cells = self.cellBound
+        if cells is None:
+            return None
+        grid = self.gridSpacing+1
+        x,y,w,h = cells
+        return (x * grid,y * grid,w * grid + 1,h * grid + 1)
+
+    @property
+    def cellBound(self):
+        '''
+        The bound of the rooms as (gx,gy,width,height) in grid units, or
+        None if there aren't any.
+        '''
+        rooms = self.rooms
+        if not rooms:
+            return None
+        x0 = min(r.gx for r in rooms)
+        y0 = min(r.gy for r in rooms)
+        x1 = max(r.gx + r.width for r in rooms)
+        y1 = max(r.gy + r.height for r in rooms)
+        return (x0,y0,x1-x0,y1-y0)
+
+    @property
+    def radius(self):
+        return min(self.width,self.height) / 2
+
+    def roomsInLayer(self,layer):
+        return [r for r in self.rooms if r.layer == layer]
+
+    @property
+    def mainRooms(self):
+        return self.roomsInLayer(self.MAIN_ROOMS)
+
+    @property
+    def halls(self):
+        return self.roomsInLayer(self.HALLS)
+
+    @property
+    def voids(self):
+        return self.roomsInLayer(self.VOIDS)
+
+    def newRoom(self,x=0,y=0,width=1,height=1,layer=VOIDS):
+        '''
+        Creates a room record with the next identifier, does not add it.
+        '''
+        room = RoomRecord(self._nextID,x,y,width,height,self.gridSpacing,layer)
+        self._nextID += 1
+        return room
+
+    def addRoom(self,room):
+        self.rooms.append(room)
+        self._broadphase = None
+        return room
+
+    def setRoomType(self,room,layer):
+        room.layer = layer
+
+    def centerIn(self,rect):
+        '''
+        Moves the rooms so their bound is centered in rect, as near as
+        whole grid units allow, so rooms on the grid stay on it and line up
+        with the voids and tiles laid out on it later.
+        '''
+        grid = self.gridSpacing+1
+        dx,dy = center(rect)
+        bx,by = center(self.bound)
+        dx = (dx - bx + grid // 2) // grid
+        dy = (dy - by + grid // 2) // grid
+        for room in self.rooms:
+            room.gx += dx
+            room.gy += dy
+        self._broadphase = None
+
+    def clip(self,rect):
+        '''
+        Removes the rooms that aren't entirely inside rect.
+        '''
+        x0,y0,x1,y1 = extents(rect)
+        self.rooms = [r for r in self.rooms if
+                      r.x >= x0 and r.y >= y0 and r.x + r.w <= x1 and r.y + r.h <= y1]
+        self._broadphase = None
+
+    def addRandomRoom(self,radius=None):
+        '''
+        Creates a new random room in a circle defined by radius whose origin
+        is the center of the dungeon.
+        '''
+        if radius is None:
+            radius = self.radius
+
+        rng = self.rng
+        grid = self.gridSpacing+1
+        w = rng.randint(1,self.maxWidth)
+        h = rng.randint(1,self.maxHeight)
+        t = 2.0 * math.pi * rng.random()
+        u = rng.random() + rng.random()
+        if u > 1:
+            r = 2 - u
+        else:
+            r = u
+        # the point picked is rounded to the nearest grid unit, once
+        cx,cy = center(self.rect)
+        room = self.newRoom(0,0,w,h)
+        room.gx = cx // grid + int(round(radius / grid * r * math.cos(t)))
+        room.gy = cy // grid + int(round(radius / grid * r * math.sin(t)))
+
+        return self.addRoom(room)
+
+    def addPoissonRooms(self,count,radius=None,attempts=30,density=0.5):
+        '''
+        Adds count random rooms that overlap neither each other nor the rooms
+        already there, so separating them has next to nothing to do.  Each
+        room is dropped at random points in a circle around the center of
+        the dungeon, spread the same way as addRandomRoom's, until it lands
+        clear of every other room.  The circle starts at radius or big
+        enough to hold the rooms at density, whichever is bigger, and grows
+        by a tenth whenever a room misses attempts times in a row.  Returns
+        the rooms added.
+        '''
+        if radius is None:
+            radius = self.radius
+
+        rng = self.rng
+        grid = self.gridSpacing+1
+        sizes = [(rng.randint(1,self.maxWidth),rng.randint(1,self.maxHeight))
+                 for i in range(0,count)]
+        # in grid units from here on
+        area = sum([w * h for w,h in sizes])
+        radius = max(radius / grid,math.sqrt(area / (math.pi * density)))
+
+        index = self.cellIndex()
+        for room in self.rooms:
+            index.insert(room)
+
+        cx,cy = center(self.rect)
+        cx //= grid
+        cy //= grid
+        added = []
+        for w,h in sizes:
+            room = self.newRoom(0,0,w,h)
+            misses = 0
+            while True:
+                t = 2.0 * math.pi * rng.random()
+                u = rng.random() + rng.random()
+                if u > 1:
+                    r = 2 - u
+                else:
+                    r = u
+                room.gx = cx + int(round(radius * r * math.cos(t))) - room.width // 2
+                room.gy = cy + int(round(radius * r * math.sin(t))) - room.height // 2
+                if not index.collide(room,collide_rooms,1):
+                    break
+                misses += 1
+                if misses == attempts:
+                    radius *= 1.1
+                    misses = 0
+            index.insert(room)
+            self.addRoom(room)
+            added.append(room)
+
+        return added
+
+    def pickMainRooms(self,pickRatio,policy='ratio',changed=None):
+        '''
+        Picks the "Main" rooms, typically called before inFillWithVoids to
+        avoid skewing the results with a ton of 1x1 rooms.  The rest become
+        voids.  policy says what pickRatio means:
+
+          'ratio'      : both sides pickRatio times the average, the original
+          'area'       : area in grid units pickRatio times the average area
+          'percentile' : area at or above the pickRatio'th percentile, 0..100
+          'top'        : the int(pickRatio) biggest by area, earliest first
+
+        Only rooms whose type changes are touched, and appended to changed if
+        it is given.  Returns the rooms picked.
+        '''
+        rooms = self.rooms
+        nrooms = len(rooms)
+        if not nrooms:
+            return []
+
+        if policy == 'ratio':
+            pick_w = pickRatio * (sum([r.width for r in rooms]) / nrooms)
+            pick_h = pickRatio * (sum([r.height for r in rooms]) / nrooms)
+            picked = [r.width >= pick_w and r.height >= pick_h for r in rooms]
+        else:
+            areas = [r.width * r.height for r in rooms]
+            if policy == 'area':
+                least = pickRatio * (sum(areas) / nrooms)
+                picked = [a >= least for a in areas]
+            elif policy == 'percentile':
+                least = sorted(areas)[max(0,min(nrooms-1,int(pickRatio / 100 * nrooms)))]
+                picked = [a >= least for a in areas]
+            elif policy == 'top':
+                picked = [False] * nrooms
+                for i in sorted(range(0,nrooms),key=lambda i: -areas[i])[:int(pickRatio)]:
+                    picked[i] = True
+            else:
+                raise ValueError('unknown pick policy %s' % policy)
+
+        main = []
+        for room,pick in zip(rooms,picked):
+            layer = Layout.MAIN_ROOMS if pick else Layout.VOIDS
+            if room.layer != layer:
+                self.setRoomType(room,layer)
+                if changed is not None:
+                    changed.append(room)
+            if pick:
+                main.append(room)
+
+        return main
+
+    def findMainRoomNeighbors(self,maxEdges=2):
+        '''
+        Tries to connect rooms by picking their maxEdges nearest neighbors.
+        Most of the time this results in a connected graph, but sometimes it
+        doesn't.  A full Delaunay triangulation would result in a fully connected
+        graph.
+        '''
+        rooms = self.mainRooms
+        for room in rooms:
+            room.pickClosestNeighbors(rooms,maxEdges)
+
+    def connectMainRooms(self,loops=0.15):
+        '''
+        Connects the main rooms along a minimum spanning tree of the Delaunay
+        triangulation of their centers, so every main room can be reached,
+        and then adds back a random loops fraction of the triangulation's
+        other edges so the dungeon isn't just a tree.  Replaces the main
+        rooms' neighbors, which are kept symmetric.
+        '''
+        rooms = self.mainRooms
+        points = [r.center for r in rooms]
+
+        candidates = Delaunay.edges(points)
+        tree = Delaunay.spanningTree(points,candidates)
+        inTree = set(tree)
+        others = [e for e in candidates if e not in inTree]
+        extra = self.rng.sample(others,int(round(loops * len(others))))
+
+        for room in rooms:
+            room.neighbors = []
+        for i,j in tree + sorted(extra):
+            rooms[i].neighbors.append(rooms[j])
+            rooms[j].neighbors.append(rooms[i])
+
+    @property
+    def edges(self):
+        '''
+        Every connection between main rooms once, as (room,neighbor) pairs.
+        '''
+        found = []
+        seen = set()
+        for room in self.mainRooms:
+            for neighbor in room.neighbors:
+                key = (min(room.id,neighbor.id),max(room.id,neighbor.id))
+                if key not in seen:
+                    seen.add(key)
+                    found.append((room,neighbor))
+        return found
+
+    @property
+    def adjacency(self):
+        '''
+        The main room graph as a dictionary of room id to neighbor ids.
+        '''
+        graph = dict((room.id,[]) for room in self.mainRooms)
+        for room,neighbor in self.edges:
+            graph[room.id].append(neighbor.id)
+            graph.setdefault(neighbor.id,[]).append(room.id)
+        return graph
+
+    def connectHallsToRooms(self,hallwidth=3,router='box'):
+        '''
+        Once main rooms have found their neighbors, we can turn surrounding void
+        rooms into hallways with width "hallwidth".
+
+        router picks how:
+          'box'    : the original, voids around the box between the two
+                     rooms' corners become hall, bucketed once so each
+                     hallway only looks at the voids under it
+          'lshape' : an L shaped corridor, see Corridors
+          'astar'  : the cheapest corridor over the grid, see Corridors
+        '''
+        if router != 'box':
+            Corridors.route(self,hallwidth,router)
+            return
+
+        # the box between the rooms' corners grown by a hall's width, in
+        # grid units, where the width is half a hall's pixels each side
+        # snapped up to the grid, and shrunk the same way for the inner box
+        half = gridToScreen(hallwidth,self.gridSpacing) // 2
+        grid = self.gridSpacing+1
+        grow = half // grid
+        shrink = -(-half // grid)
+
+        voids = SpatialHash(8,operator.attrgetter('cells'))
+        for v in self.rooms:
+            if v.isVoid:
+                voids.insert(v)
+
+        for room,neighbor in self.edges:
+
+            x = min(room.gx,neighbor.gx)
+            y = min(room.gy,neighbor.gy)
+            cw = abs(room.gx - neighbor.gx)
+            ch = abs(room.gy - neighbor.gy)
+            outer = (x - grow,y - grow,cw + hallwidth,ch + hallwidth)
+            inner = (x + shrink,y + shrink,cw - hallwidth,ch - hallwidth)
+            hollow = inner[2] > 0 and inner[3] > 0
+
+            for v in list(voids.query(outer)):
+                # sharing an edge with a box doesn't count, as for rooms
+                if not colliderect(outer,v.cells):
+                    continue
+                if hollow and v.width == 1 and v.height == 1 and colliderect(inner,v.cells):
+                    continue
+                self.setRoomType(v,Layout.HALLS)
+                voids.remove(v)
+
+    def inFillWithVoids(self,width=1,height=1,bounds=None,materialise=True):
+        '''
+        Fills the bounds rectangle with unit void rooms wherever they don't
+        collide with a room already in the dungeon.  The rooms are drawn
+        once into an Occupancy grid, kept as self.occupancy, and void rooms
+        are only created for the cells left free.  If materialise is False
+        no void rooms are created at all, the free cells of self.occupancy
+        are the voids.
+        '''
+        if bounds is None:
+            bounds = self.bound
+
+        grid = self.gridSpacing+1
+        bx,by,bw,bh = bounds
+        xfin = bx + bw - grid
+        yfin = by + bh - grid
+
+        self.occupancy = Occupancy(roundm(bx,grid),roundm(by,grid),
+                                   len(range(bx,xfin,grid)),
+                                   len(range(by,yfin,grid)),
+                                   self.gridSpacing)
+        for room in self.rooms:
+            self.occupancy.fillRect(room.rect)
+
+        if not materialise:
+            return
+
+        for c,r in self.occupancy.find(0):
+            x,y = self.occupancy.cellOrigin(c,r)
+            self.rooms.append(self.newRoom(x,y))
+
+    def stopRooms(self):
+        '''
+        Zeros the velocity of all rooms in the dungeon.
+        '''
+        for room in self.rooms:
+            room.stop()
+
+    def update(self):
+        # rooms that are still wouldn't move, skip them
+        for room in self.rooms:
+            if room.vx or room.vy:
+                room.update()
+
+    def cellIndex(self):
+        '''
+        An empty SpatialHash of rooms by their grid unit cells, with buckets
+        the size of the largest room.
+        '''
+        return SpatialHash(max(self.maxWidth,self.maxHeight),
+                           operator.attrgetter('cells'))
+
+    @property
+    def broadphase(self):
+        '''
+        A cellIndex of the rooms, rebuilt whenever rooms are added or moved
+        wholesale.  Rebuilding it also marks every room restless again, see
+        _gridStep.
+        '''
+        if self._broadphase is None or len(self._broadphase) != len(self.rooms):
+            self._broadphase = self.cellIndex()
+            for room in self.rooms:
+                self._broadphase.insert(room)
+            self._restless = None
+        return self._broadphase
+
+    def spreadOutRooms(self,limit=None,engine='grid',budget=None):
+        '''
+        Collides rooms with a 'collide and scatter' function that will cause
+        rooms to seperate from one another. Runs at most limit iterations,
+        forever if limit is None, and returns True once the rooms are apart.
+
+        engine selects how each iteration finds collisions:
+          'grid'    : every overlapping pair found through the broadphase
+                      is pushed apart in the same iteration
+          'numpy'   : the grid engine on arrays of all the rooms at once,
+                      see BatchSeparation, needs numpy
+          'scatter' : the original, tests every room against every other
+                      room and only scatters the first collision found
+          'bounded' : the grid engine for at most limit iterations and
+                      budget seconds, then any rooms still overlapping are
+                      pushed straight out from the middle, see
+                      _boundedSpread.  Always returns True.
+
+        The grid engine pushes a pile of 5000 rooms apart in about five
+        seconds, see Benchmark.py separation.  Rooms seeded with
+        addPoissonRooms, Layout.generate(...,seeding='poisson'), start
+        apart and take a single iteration.
+        '''
+        if engine == 'bounded':
+            return self._boundedSpread(limit,budget)
+
+        if engine == 'numpy':
+            # imported here so numpy is only needed by those who ask for it
+            import BatchSeparation
+            done,steps = BatchSeparation.spreadOutRooms(self,limit)
+            self.counters['separationSteps'] += steps
+            self._broadphase = None
+            if done:
+                self.stopRooms()
+            return done
+
+        step = {'grid':self._gridStep,
+                'scatter':self._scatterStep}[engine]
+        steps = 0
+        done = False
+
+        while limit is None or steps < limit:
+            steps += 1
+            if not step():
+                self.stopRooms()
+                done = True
+                break
+
+        self.counters['separationSteps'] += steps
+        return done
+
+    def _scatterStep(self):
+        rooms = self.rooms
+        self.update()
+        for room in rooms:
+            self.counters['collisionTests'] += len(rooms)
+            collided = False
+            for other in rooms:
+                if collide_rooms(room,other):
+                    other.repulse(room,self.rng)
+                    collided = True
+                else:
+                    other.stop()
+            if collided:
+                self._broadphase = None
+                return True
+        return False
+
+    # iterations the bounded engine runs if not given a limit, and how many
+    # of them it waits for the overlap to shrink before giving up early
+    BOUNDED_LIMIT = 500
+    BOUNDED_PATIENCE = 50
+
+    def _boundedSpread(self,limit=None,budget=None):
+        '''
+        Separation with a ceiling on its latency.  Runs grid iterations while
+        the total overlap area keeps shrinking, damping the pushes whenever
+        it grows so oscillating rooms settle, for at most limit iterations
+        and budget seconds.  Whatever still overlaps then goes to
+        _radialSpread, which always finishes.  The overlap after each
+        iteration is kept in self.separationHistory.
+
+        A time budget makes the result depend on how fast the machine is,
+        an iteration limit alone doesn't.
+        '''
+        if limit is None:
+            limit = self.BOUNDED_LIMIT
+        deadline = None if budget is None else time.perf_counter() + budget
+
+        history = self.separationHistory = []
+        damping = 1.0
+        best = None
+        sinceBest = 0
+        steps = 0
+        area = 1
+
+        while steps < limit and area:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            steps += 1
+            area = self._gridStep(damping=damping)
+            if history and area >= history[-1]:
+                damping = max(0.25,damping * 0.7)
+            else:
+                damping = min(1.0,damping * 1.1)
+            history.append(area)
+
+            if best is None or area < best:
+                best = area
+                sinceBest = 0
+            else:
+                sinceBest += 1
+                if sinceBest >= self.BOUNDED_PATIENCE:
+                    break
+
+        self.counters['separationSteps'] += steps
+        if area:
+            self.counters['separationFallbacks'] += 1
+            self._radialSpread()
+        self.stopRooms()
+        return True
+
+    def _radialSpread(self):
+        '''
+        Moves every room that overlaps another straight away from the middle
+        of the dungeon until it's clear, jumping past each room it hits.
+        The outermost rooms go first.  Each room only moves outwards while
+        the others stand still, so every room is clear in the end.
+        '''
+        index = self.broadphase
+        # centers are doubled to keep them in whole grid units
+        x,y,w,h = self.cellBound
+        mx,my = 2*x + w,2*y + h
+
+        def far(room):
+            cx,cy = 2*room.gx + room.width,2*room.gy + room.height
+            return (-((cx - mx)**2 + (cy - my)**2),room.id)
+
+        for room in sorted(self.rooms,key=far):
+            others = index.collide(room,collide_rooms)
+            if not others:
+                continue
+            dx = 2*room.gx + room.width - mx
+            dy = 2*room.gy + room.height - my
+            if dx == 0 and dy == 0:
+                dx = 1
+            # the direction as grid units per grid unit along the longer axis
+            longest = max(abs(dx),abs(dy))
+            ux,uy = dx / longest,dy / longest
+            x0,y0 = room.gx,room.gy
+            n = 0
+            while others:
+                # jump to where the room clears everything it hit, each
+                # along whichever axis clears it first, always moving on
+                n += 1
+                for other in others:
+                    need = []
+                    if ux > 0:
+                        need.append((other.gx + other.width - x0) / ux)
+                    elif ux < 0:
+                        need.append((x0 + room.width - other.gx) / -ux)
+                    if uy > 0:
+                        need.append((other.gy + other.height - y0) / uy)
+                    elif uy < 0:
+                        need.append((y0 + room.height - other.gy) / -uy)
+                    n = max(n,int(math.ceil(min(need))))
+                room.gx = x0 + int(round(ux * n))
+                room.gy = y0 + int(round(uy * n))
+                index.move(room)
+                others = index.collide(room,collide_rooms)
+
+    def _gridStep(self,crowd=16,pressure=0.5,damping=1.0):
+        '''
+        Every overlapping room is pushed out of the rooms it overlaps, along
+        the axis that overlaps least, by whole grid units.  Crowded rooms
+        are also pushed away from the middle of the dungeon in proportion
+        to how crowded they are, so a dense pile expands all at once
+        instead of one ring of rooms at a time.
+
+        Rooms move as soon as their push is known so the space they leave
+        is seen by the rest of the iteration.  Only the first crowd
+        overlaps are counted, keeping each iteration linear in the number
+        of rooms.  The pushes are scaled by damping.  Everything is in grid
+        units, each room's push is rounded to whole ones once.  Returns the
+        total area of the overlaps found in grid units, zero once the rooms
+        are apart.
+
+        Once fewer than half of the rooms move in an iteration only the
+        restless rooms are tested from then on: every room that overlaps
+        another is kept in self._restless, a room leaves it once it's found
+        clear and the rooms a moved room lands on join it.  Rooms that have
+        settled cost nothing, so the long tail of iterations spent on the
+        last few overlaps is cheap, and the rooms end up exactly where
+        testing every room would have put them.
+        '''
+        index = self.broadphase
+        restless = self._restless
+        tests = index.tests
+        # centers are doubled to keep them in whole grid units
+        x,y,w,h = self.cellBound
+        mx,my = 2*x + w,2*y + h
+        randint = self.rng.randint
+        overlap = 0
+
+        moved = []
+
+        for room in self.rooms:
+            if restless is not None and room not in restless:
+                continue
+            others = index.collide(room,collide_rooms,crowd)
+            if not len(others):
+                if restless is not None:
+                    restless.discard(room)
+                continue
+            dx = dy = 0
+            x,y,w,h = room.gx,room.gy,room.width,room.height
+            cx,cy = 2*x + w,2*y + h
+            for other in others:
+                ox,oy,ow,oh = other.gx,other.gy,other.width,other.height
+                # distance to move until the rooms only share an edge
+                px = min(x+w,ox+ow) - max(x,ox)
+                py = min(y+h,oy+oh) - max(y,oy)
+                overlap += px * py
+                if px < py:
+                    dx += px if (cx,room.id) > (2*ox + ow,other.id) else -px
+                else:
+                    dy += py if (cy,room.id) > (2*oy + oh,other.id) else -py
+            crowding = pressure * len(others) / crowd
+            dx += (cx - mx) * crowding / 2
+            dy += (cy - my) * crowding / 2
+            if damping != 1.0:
+                dx *= damping
+                dy *= damping
+            # room.push, room.update and room.stop, inlined
+            room.gx = x + int(round(room.vx + dx)) + randint(-1,1)
+            room.gy = y + int(round(room.vy + dy)) + randint(-1,1)
+            room.vx = room.vy = 0
+            index.move(room)
+            if restless is None:
+                moved.append(room)
+            else:
+                restless.update(index.collide(room,collide_rooms))
+
+        if restless is None and len(moved) < len(self.rooms) // 2:
+            # whatever overlaps now overlaps a room that just moved
+            restless = self._restless = set(moved)
+            for room in moved:
+                restless.update(index.collide(room,collide_rooms))
+
+        self.counters['collisionTests'] += index.tests - tests
+        return overlap
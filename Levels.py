@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+## A stack of dungeon levels joined by stairs.  Every level is an ordinary
+## layout generated on its own, all of them at once on a pool of worker
+## processes, and then stairs are picked between each pair of adjacent
+## levels: main rooms that overlap the main room above them, found with a
+## SpatialHash, so going up or down the stairs puts you in the same place.
+##
+##   levels = generate_levels(5,seed=42,seedRooms=150)
+##   for level,down,up,x,y in levels.stairs:
+##       ...  # room down on level level and room up on level level+1 meet at x,y
+##
+## Levels are centered on the same (0,0,width,height) so their coords agree.
+
+import hashlib
+import struct
+
+from Layout import Layout, gridToScreen
+from Parallel import generate_many
+from SpatialHash import SpatialHash
+
+def levelSeed(seed,level):
+    '''
+    The seed of the level'th level of the stack seeded with seed, the same
+    in every process and run.
+    '''
+    text = repr((seed,level)).encode('utf-8')
+    return struct.unpack('<Q',hashlib.sha256(b'level' + text).digest()[:8])[0]
+
+def overlap(a,b):
+    '''
+    The rect where the rooms a and b overlap, None if they don't.
+    '''
+    x0,y0 = max(a.x,b.x),max(a.y,b.y)
+    x1,y1 = min(a.x+a.w,b.x+b.w),min(a.y+a.h,b.y+b.h)
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        # not even sharing an edge, or only that
+        return None
+    return (x0,y0,x1 - x0,y1 - y0)
+
+def pickStairs(lower,upper,count=1,avoid=()):
+    '''
+    Picks count pairs of main rooms, one from each of the layouts lower and
+    upper, to put stairs between.  The rooms that overlap the most come
+    first, each room used once and the ids in avoid not at all on lower.
+    When there aren't enough overlapping rooms the closest pairs make up
+    the rest.  Returns (lowerID,upperID,x,y) tuples, x,y the middle of the
+    overlap, or of the lower room if they don't.
+    '''
+    below = [r for r in lower.mainRooms if r.id not in avoid]
+    above = upper.mainRooms
+    if not below or not above:
+        return []
+
+    index = SpatialHash(gridToScreen(max(upper.maxWidth,upper.maxHeight),upper.gridSpacing))
+    for room in above:
+        index.insert(room)
+
+    candidates = []
+    for room in below:
+        for other in index.query(room.rect):
+            rect = overlap(room,other)
+            if rect is not None:
+                candidates.append((-rect[2] * rect[3],room.id,other.id,room,other,rect))
+    candidates.sort(key=lambda c: c[:3])
+
+    stairs = []
+    used = set()
+    for area,lowerID,upperID,room,other,(x,y,w,h) in candidates:
+        if len(stairs) == count:
+            return stairs
+        if room in used or other in used:
+            continue
+        used.update((room,other))
+        stairs.append((lowerID,upperID,x + w//2,y + h//2))
+
+    pairs = sorted((room.distance_to(other),room.id,other.id,room,other)
+                   for room in below for other in above
+                   if room not in used and other not in used)
+    for distance,lowerID,upperID,room,other in pairs:
+        if len(stairs) == count:
+            break
+        if room in used or other in used:
+            continue
+        used.update((room,other))
+        stairs.append((lowerID,upperID) + room.center)
+    return stairs
+
+
+class Levels(object):
+    '''
+    The levels of a dungeon, bottom first, and the stairs between them as
+    (level,downID,upID,x,y) tuples: room downID on level and room upID on
+    level+1 both hold the stairs at x,y.
+    '''
+
+    def __init__(self,layouts,stairs=None):
+        self.layouts = list(layouts)
+        self.stairs = list(stairs or ())
+
+    def __len__(self):
+        return len(self.layouts)
+
+    def __getitem__(self,level):
+        return self.layouts[level]
+
+    def __iter__(self):
+        return iter(self.layouts)
+
+    def link(self,count=1):
+        '''
+        Picks count stairs between every pair of adjacent levels, see
+        pickStairs.  A room where stairs arrive from below isn't also used
+        for the stairs going up.
+        '''
+        self.stairs = []
+        arrived = set()
+        for level in range(0,len(self.layouts)-1):
+            for down,up,x,y in pickStairs(self.layouts[level],self.layouts[level+1],count,arrived):
+                self.stairs.append((level,down,up,x,y))
+            arrived = set(s[2] for s in self.stairs if s[0] == level)
+        return self.stairs
+
+    def stairsOn(self,level):
+        '''
+        The stairs on level as (roomID,toLevel,toRoomID,x,y) tuples, going
+        down and up.
+        '''
+        found = []
+        for lower,down,up,x,y in self.stairs:
+            if lower == level:
+                found.append((down,level+1,up,x,y))
+            if lower + 1 == level:
+                found.append((up,level-1,down,x,y))
+        return found
+
+    def toData(self):
+        '''
+        The levels' Layout.toData() and the stairs, plain data like them.
+        '''
+        return {'levels':[layout.toData() for layout in self.layouts],
+                'stairs':list(self.stairs)}
+
+    @classmethod
+    def fromData(cls,data):
+        return cls([Layout.fromData(d) for d in data['levels']],
+                   [tuple(s) for s in data['stairs']])
+
+
+def generate_levels(n,seed=0,stairs=1,workers=None,pool=None,width=1024,height=1024,**params):
+    '''
+    Generates n levels of width by height, all at once on a pool of workers
+    processes (default one per cpu) or on pool if given, and joins each
+    pair of adjacent levels with stairs stairs.  Level i is seeded with
+    levelSeed(seed,i).  Other keyword arguments are passed on to
+    Layout.generate for every level.  Returns the Levels.
+    '''
+    seeds = [levelSeed(seed,level) for level in range(0,n)]
+    done = dict(generate_many(seeds=seeds,workers=workers,pool=pool,
+                              width=width,height=height,**params))
+    levels = Levels([Layout.fromData(done[s]) for s in seeds])
+    levels.link(stairs)
+    return levels
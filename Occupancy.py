@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import re
+
+## A grid of byte sized cells laid over the dungeon, one cell per grid unit.
+## Cell (0,0) has its top left corner at the screen coords (x,y) and cells
+## are gridSpacing+1 pixels apart, the same as a 1x1 room.
+
+class Occupancy(object):
+
+    def __init__(self,x,y,columns,rows,gridSpacing):
+        '''
+               x, y : screen coords of cell (0,0)
+        columns, rows : size in grid units
+          gridSpacing : grid void distance
+        '''
+        self.x = x
+        self.y = y
+        self.columns = max(0,columns)
+        self.rows = max(0,rows)
+        self.gridSpacing = gridSpacing
+        self.cells = bytearray(self.columns * self.rows)
+
+    def __repr__(self):
+        return 'Occupancy(%d,%d,%dx%d)' % (self.x,self.y,self.columns,self.rows)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __getitem__(self,cell):
+        c,r = cell
+        return self.cells[r * self.columns + c]
+
+    def __setitem__(self,cell,value):
+        c,r = cell
+        self.cells[r * self.columns + c] = value
+
+    @property
+    def pitch(self):
+        return self.gridSpacing+1
+
+    def cellOrigin(self,c,r):
+        '''
+        Screen coords of the top left corner of cell (c,r).
+        '''
+        return (self.x + c * self.pitch,self.y + r * self.pitch)
+
+    def cellRect(self,c,r):
+        '''
+        Screen rect of a 1x1 room sitting in cell (c,r).
+        '''
+        x,y = self.cellOrigin(c,r)
+        return (x,y,self.pitch+1,self.pitch+1)
+
+    def cellsUnder(self,rect):
+        '''
+        Returns the cells (c0,r0,c1,r1), c1 and r1 exclusive, that a 1x1 room
+        would collide with rect in.  Like collide_rooms, sharing an edge with
+        rect doesn't count.  The range is clipped to the grid and may be empty.
+        '''
+        x,y,w,h = rect
+        if w <= 2 or h <= 2:
+            return (0,0,0,0)
+        g = self.pitch
+        x -= self.x
+        y -= self.y
+        c0 = max(0,(x + 1) // g)
+        r0 = max(0,(y + 1) // g)
+        c1 = min(self.columns,-(-(x + w - 2) // g))
+        r1 = min(self.rows,-(-(y + h - 2) // g))
+        return (c0,r0,max(c0,c1),max(r0,r1))
+
+    def fill(self,c0,r0,c1,r1,value=1):
+        '''
+        Sets the cells in columns [c0,c1) and rows [r0,r1) to value.
+        '''
+        if c1 <= c0:
+            return
+        span = bytes([value]) * (c1 - c0)
+        cells = self.cells
+        for r in range(r0,r1):
+            i = r * self.columns
+            cells[i+c0:i+c1] = span
+
+    def fillRect(self,rect,value=1):
+        '''
+        Sets the cells under the screen rect to value, see cellsUnder.
+        '''
+        self.fill(*self.cellsUnder(rect),value=value)
+
+    def count(self,value):
+        return self.cells.count(value)
+
+    def runs(self,value):
+        '''
+        Run length encodes the cells equal to value, yielding a (r,c0,c1)
+        for each horizontal run of them, c1 exclusive.
+        '''
+        pattern = re.compile(re.escape(bytes([value])) + b'+')
+        cells = self.cells
+        for r in range(0,self.rows):
+            i = r * self.columns
+            for m in pattern.finditer(cells,i,i + self.columns):
+                yield (r,m.start() - i,m.end() - i)
+
+    def find(self,value):
+        '''
+        Yields the (c,r) of every cell equal to value, row by row.
+        '''
+        for r,c0,c1 in self.runs(value):
+            for c in range(c0,c1):
+                yield (c,r)
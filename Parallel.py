@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+## Generates lots of dungeons at once on a pool of worker processes.  The
+## workers only import Layout, never pygame, and send back Layout.toData()
+## so nothing heavier than tuples of ints crosses between processes.
+##
+##   for seed,data in generate_many(1000,workers=8,seedRooms=150):
+##       layout = Layout.fromData(data)
+
+import multiprocessing
+
+from Layout import Layout
+
+def _generate(job):
+    '''
+    Runs in a worker, generates one dungeon from its seed.
+    '''
+    seed,params = job
+    return seed,Layout.generate(seed=seed,**params).toData()
+
+def generate_many(n=None,seeds=None,workers=None,width=1024,height=1024,chunksize=1,
+                  pool=None,**params):
+    '''
+    Generates n dungeons, or one per seed in seeds, across workers processes
+    (default one per cpu), or on pool, a multiprocessing.Pool shared with
+    other work, if given.  Each dungeon has its own random.Random seeded
+    with its seed, see Layout.generate.  Yields (seed,data) tuples in the order they
+    finish, data being Layout.toData().  Without seeds, the seeds are
+    0 to n-1.  Other keyword arguments are passed on to Layout.generate.
+    Raises ValueError straight away if given neither n nor seeds.
+    '''
+    if seeds is None:
+        if n is None:
+            raise ValueError('generate_many needs n, how many dungeons, or their seeds')
+        seeds = range(0,n)
+    elif n is not None:
+        seeds = list(seeds)[:n]
+
+    params.update(width=width,height=height)
+    jobs = ((seed,params) for seed in seeds)
+    return _results(jobs,workers,chunksize,pool)
+
+def _results(jobs,workers,chunksize,pool):
+    '''
+    Yields the results of jobs as they finish, see generate_many.
+    '''
+    if pool is not None:
+        for result in pool.imap_unordered(_generate,jobs,chunksize):
+            yield result
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(_generate,jobs,chunksize):
+            yield result
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+## Dungeon generation as a list of named stages with a snapshot of the
+## layout kept after each one.  Changing a parameter only throws away the
+## snapshots of the stages that use it and those after them, so the next
+## run picks up from the last good snapshot instead of starting over:
+##
+##   pipeline = Pipeline(1024,1024,seed=42)
+##   layout = pipeline.run()
+##   pipeline.set(pickRatio=1.5)     # keeps rooms, separate and center
+##   layout = pipeline.run()         # only picks, fills and connects again
+##
+## A snapshot is the layout's toData() and the state of the rng, so a
+## resumed run generates exactly what a run from scratch with the same
+## parameters would.
+##
+## Each callback is called with a record of every stage as it finishes, a
+## dict of the stage's name, its time in seconds, the rooms of each kind
+## after it and the work it did from Layout.counters, e.g.
+##
+##   {'stage':'separate','seconds':0.21,'rooms':150,'mainRooms':0,
+##    'halls':0,'voids':150,'separationSteps':16,'collisionTests':9210,
+##    'seed':42}
+##
+## plus its peakBytes if traceMemory.  With no callbacks nothing is measured.
+
+import random
+import time
+import tracemalloc
+
+from Layout import Layout
+
+class Pipeline(object):
+
+    # the stages in the order they run and the parameters each one uses
+    STAGES = ('rooms','separate','center','mainRooms','voids','connect','halls')
+    PARAMS = {'rooms':('width','height','maxRoomDimension','gridSpacing','seedRooms','seeding','seed'),
+              'separate':('separation','separationLimit','separationBudget'),
+              'center':(),
+              'mainRooms':('pickRatio','pickPolicy'),
+              'voids':(),
+              'connect':('loops',),
+              'halls':('hallwidth','halls')}
+
+    def __init__(self,width,height,maxRoomDimension=10,gridSpacing=8,seedRooms=150,
+                 separation='grid',pickRatio=1.25,loops=0.15,hallwidth=3,halls='box',
+                 seed=None,rng=None,keep=True,callbacks=None,traceMemory=False,
+                 separationLimit=None,separationBudget=None,pickPolicy='ratio',
+                 seeding='uniform'):
+        '''
+        The parameters are those of Layout.generate plus the ones it leaves
+        at their defaults.  keep False doesn't take snapshots, for a single
+        run from scratch.  callbacks get each stage's record, with the peak
+        memory traced during the stage if traceMemory, see Instruments.
+        pickPolicy is how main rooms are picked, see Layout.pickMainRooms.
+        seeding is how rooms are first dropped, see Layout.generate.
+        '''
+        self.params = {'width':width,
+                       'height':height,
+                       'maxRoomDimension':maxRoomDimension,
+                       'gridSpacing':gridSpacing,
+                       'seedRooms':seedRooms,
+                       'seeding':seeding,
+                       'separation':separation,
+                       'separationLimit':separationLimit,
+                       'separationBudget':separationBudget,
+                       'pickRatio':pickRatio,
+                       'pickPolicy':pickPolicy,
+                       'loops':loops,
+                       'hallwidth':hallwidth,
+                       'halls':halls,
+                       'seed':seed}
+        if rng is None:
+            rng = random.Random(seed)
+        self.rng = rng
+        self.start = rng.getstate()
+        self.keep = keep
+        self.snapshots = {}
+        self.callbacks = list(callbacks or ())
+        self.traceMemory = traceMemory
+
+    def __getitem__(self,name):
+        return self.params[name]
+
+    def set(self,**params):
+        '''
+        Changes parameters, dropping the snapshots they make stale.
+        '''
+        for name,value in params.items():
+            if name not in self.params:
+                raise TypeError('unknown parameter %s' % name)
+            if self.params[name] == value:
+                continue
+            self.params[name] = value
+            if name == 'seed':
+                self.start = random.Random(value).getstate()
+            self.invalidate(self.stageUsing(name))
+
+    def stageUsing(self,name):
+        for stage in self.STAGES:
+            if name in self.PARAMS[stage]:
+                return stage
+
+    def invalidate(self,stage='rooms'):
+        '''
+        Drops the snapshots of stage and every stage after it.
+        '''
+        for name in self.STAGES[self.STAGES.index(stage):]:
+            self.snapshots.pop(name,None)
+
+    def snapshot(self,layout):
+        return (layout.toData(),self.rng.getstate())
+
+    def restore(self,snapshot):
+        '''
+        A new layout from a snapshot, with the rng put back where it was.
+        '''
+        data,state = snapshot
+        self.rng.setstate(state)
+        layout = Layout.fromData(data)
+        layout.rng = self.rng
+        return layout
+
+    def run(self,until='halls'):
+        '''
+        Runs the stages up to and including until, resuming from the latest
+        snapshot, and returns the layout.  The layout is a copy, changing it
+        doesn't change the snapshots.
+        '''
+        layout,todo = self.resume(until)
+        for stage in todo:
+            layout = self.runStage(stage,layout)
+        return layout
+
+    def resume(self,until='halls'):
+        '''
+        Returns the layout restored from the latest snapshot of the stages
+        up to until, None if there isn't one, and the stages left to run.
+        '''
+        stages = self.STAGES[:self.STAGES.index(until)+1]
+        for i in range(len(stages)-1,-1,-1):
+            if stages[i] in self.snapshots:
+                return self.restore(self.snapshots[stages[i]]),stages[i+1:]
+        self.rng.setstate(self.start)
+        return None,stages
+
+    def runStage(self,stage,layout):
+        '''
+        Runs one stage on layout and snapshots the result, returns the layout.
+        '''
+        if self.callbacks:
+            layout = self.measureStage(stage,layout)
+        else:
+            layout = getattr(self,'_' + stage)(layout)
+        if self.keep:
+            self.snapshots[stage] = self.snapshot(layout)
+        return layout
+
+    def measureStage(self,stage,layout):
+        '''
+        Runs one stage and calls the callbacks with its record.
+        '''
+        before = dict(layout.counters) if layout is not None else {}
+        tracing = False
+        if self.traceMemory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                tracing = True
+
+        start = time.perf_counter()
+        layout = getattr(self,'_' + stage)(layout)
+        seconds = time.perf_counter() - start
+
+        record = {'stage':stage,
+                  'seconds':seconds,
+                  'seed':self.params['seed'],
+                  'rooms':len(layout.rooms),
+                  'mainRooms':len(layout.mainRooms),
+                  'halls':len(layout.halls),
+                  'voids':len(layout.voids)}
+        for name,count in layout.counters.items():
+            record[name] = count - before.get(name,0)
+        if self.traceMemory:
+            record['peakBytes'] = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+
+        for callback in self.callbacks:
+            callback(record)
+        return layout
+
+    def _rooms(self,layout):
+        p = self.params
+        layout = Layout(p['width'],p['height'],
+                        p['maxRoomDimension'],
+                        p['maxRoomDimension'],
+                        p['gridSpacing'],
+                        self.rng)
+        if p['seeding'] == 'poisson':
+            layout.addPoissonRooms(p['seedRooms'],layout.radius/5)
+        elif p['seeding'] == 'uniform':
+            for x in range(0,p['seedRooms']):
+                layout.addRandomRoom(layout.radius/5) # XXX magic number
+        else:
+            raise ValueError('unknown seeding %s' % p['seeding'])
+        return layout
+
+    def _separate(self,layout):
+        layout.spreadOutRooms(self.params['separationLimit'],
+                              self.params['separation'],
+                              self.params['separationBudget'])
+        return layout
+
+    def _center(self,layout):
+        layout.centerIn((0,0,layout.width,layout.height))
+        return layout
+
+    def _mainRooms(self,layout):
+        layout.pickMainRooms(self.params['pickRatio'],self.params['pickPolicy'])
+        return layout
+
+    def _voids(self,layout):
+        layout.inFillWithVoids()
+        return layout
+
+    def _connect(self,layout):
+        layout.connectMainRooms(self.params['loops'])
+        return layout
+
+    def _halls(self,layout):
+        layout.connectHallsToRooms(self.params['hallwidth'],self.params['halls'])
+        return layout
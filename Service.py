@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+
+## Generating dungeons from asyncio without blocking the event loop.  The
+## Pipeline stages run one at a time in an executor, so a generation
+## nobody is waiting for any more is cancelled at the next stage, and
+## concurrent requests for the same dungeon share a single generation.
+##
+##   data = await generate_async({'width':1024,'height':1024},seed=42)
+##
+## Run as a script it is a stand in server for load testing, taking a line
+## of JSON parameters and answering with a line of JSON Layout.toData():
+##
+##   python3 Service.py serve --port 8765
+##   python3 Service.py load --port 8765 --requests 200 --seeds 10
+
+import argparse
+import asyncio
+import collections
+import json
+import time
+
+from Pipeline import Pipeline
+
+class Busy(RuntimeError):
+    '''
+    Raised when a DungeonService already has as many requests as it queues.
+    '''
+    pass
+
+
+def _runStage(pipeline,stage,layout):
+    # module level so it can be sent to a process pool
+    return pipeline.runStage(stage,layout)
+
+
+class DungeonService(object):
+
+    def __init__(self,executor=None,limit=4,maxPending=None):
+        '''
+        executor   : where the stages run, the event loop's default thread
+                     pool if None.  A ProcessPoolExecutor generates in
+                     parallel, at the cost of pickling the layout between
+                     stages.
+        limit      : the most generations run at once, the rest wait
+        maxPending : the most different dungeons waiting or running, more
+                     raise Busy.  None for no limit.
+        '''
+        self.executor = executor
+        self.limit = limit
+        self.maxPending = maxPending
+        self.semaphore = None
+        self.inflight = {}
+        self.waiting = collections.Counter()
+        self.counters = collections.Counter()
+
+    @staticmethod
+    def key(seed,params):
+        '''
+        Requests with the same key get the same dungeon, defaults included.
+        '''
+        return tuple(sorted(Pipeline(seed=seed,keep=False,**params).params.items()))
+
+    async def generate(self,params,seed):
+        '''
+        Returns Layout.toData() of the dungeon Pipeline(seed=seed,**params)
+        makes.  Identical requests made while one is running wait for that
+        one, and all of them get the same dict, so don't change it.
+        Cancelling every request for a dungeon cancels its generation.
+        '''
+        key = self.key(seed,params)
+        self.counters['requests'] += 1
+
+        task = self.inflight.get(key)
+        if task is None:
+            if self.maxPending is not None and len(self.inflight) >= self.maxPending:
+                self.counters['rejected'] += 1
+                raise Busy('%d dungeons already pending' % len(self.inflight))
+            task = asyncio.ensure_future(self._generate(seed,params))
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key,t))
+        else:
+            self.counters['coalesced'] += 1
+
+        self.waiting[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self.waiting[key] == 1 and not task.done():
+                # the last one waiting went away, forget the task now so a
+                # new request for the same dungeon doesn't join a dying one
+                self._forget(key,task)
+                task.cancel()
+                self.counters['cancelled'] += 1
+            raise
+        finally:
+            self.waiting[key] -= 1
+            if not self.waiting[key]:
+                del(self.waiting[key])
+
+    def _forget(self,key,task):
+        # only if it's still the task for key, a newer one may have replaced it
+        if self.inflight.get(key) is task:
+            del(self.inflight[key])
+
+    async def _generate(self,seed,params):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.limit)
+        async with self.semaphore:
+            pipeline = Pipeline(seed=seed,keep=False,**params)
+            layout,todo = pipeline.resume()
+            for stage in todo:
+                # a cancel lands here, and stops the generation once the
+                # stage that's running is done
+                layout = await self._inExecutor(_runStage,pipeline,stage,layout)
+            data = await self._inExecutor(layout.toData)
+        self.counters['generated'] += 1
+        return data
+
+    async def _inExecutor(self,func,*args):
+        '''
+        Runs func(*args) in the executor.  A call can't be stopped once it
+        has started, so if cancelled this waits for it to finish before
+        passing the cancel on, keeping its semaphore slot until then so
+        limit really caps the work running.
+        '''
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor,func,*args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            while not future.done():
+                try:
+                    await asyncio.wait([future])
+                except asyncio.CancelledError:
+                    pass
+            raise
+
+
+_default = None
+
+async def generate_async(params,seed,service=None):
+    '''
+    DungeonService.generate on service, or on a shared default service.
+    '''
+    global _default
+    if service is None:
+        if _default is None:
+            _default = DungeonService()
+        service = _default
+    return await service.generate(params,seed)
+
+
+async def serve(host,port,service):
+    '''
+    Answers each line of JSON, the Pipeline parameters and a seed, with a
+    line of JSON, the dungeon's Layout.toData() or an error.
+    '''
+    async def handle(reader,writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    params = json.loads(line)
+                    seed = params.pop('seed')
+                    reply = {'dungeon':await service.generate(params,seed)}
+                except Busy as e:
+                    reply = {'error':'busy','message':str(e)}
+                except (ValueError,KeyError,TypeError) as e:
+                    reply = {'error':'bad request','message':str(e)}
+                writer.write(json.dumps(reply).encode('utf-8') + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle,host,port,limit=1<<20)
+    print('serving on %s:%d' % (host,port))
+    async with server:
+        await server.serve_forever()
+
+
+async def load(host,port,requests,seeds,concurrency,params):
+    '''
+    Sends requests requests for seeds different dungeons, concurrency at a
+    time, and reports the requests per second and latencies.
+    '''
+    latencies = []
+    errors = collections.Counter()
+    todo = asyncio.Queue()
+    for i in range(requests):
+        todo.put_nowait(dict(params,seed=i % seeds))
+
+    async def client():
+        reader,writer = await asyncio.open_connection(host,port,limit=1<<26)
+        while not todo.empty():
+            request = todo.get_nowait()
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode('utf-8') + b'\n')
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            if 'error' in reply:
+                errors[reply['error']] += 1
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print('%d requests %.2fs %.1f requests/s latency p50=%.3fs p99=%.3fs errors=%s' %
+          (len(latencies),elapsed,len(latencies) / elapsed,
+           latencies[len(latencies) // 2],latencies[int(len(latencies) * 0.99)],
+           dict(errors)))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Dungeon generation service')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    p = commands.add_parser('serve',help='run the stand in server')
+    p.add_argument('--host',default='127.0.0.1')
+    p.add_argument('--port',type=int,default=8765)
+    p.add_argument('--limit',type=int,default=4,help='generations run at once')
+    p.add_argument('--maxPending',type=int,default=None)
+    p.add_argument('--processes',type=int,default=0,
+                   help='generate on a pool of this many processes instead of threads')
+
+    p = commands.add_parser('load',help='load test a running server')
+    p.add_argument('--host',default='127.0.0.1')
+    p.add_argument('--port',type=int,default=8765)
+    p.add_argument('--requests',type=int,default=200)
+    p.add_argument('--seeds',type=int,default=10,help='different dungeons asked for')
+    p.add_argument('--concurrency',type=int,default=32)
+    p.add_argument('--width',type=int,default=1024)
+    p.add_argument('--height',type=int,default=1024)
+    p.add_argument('--seedRooms',type=int,default=150)
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        executor = None
+        if args.processes:
+            import concurrent.futures
+            executor = concurrent.futures.ProcessPoolExecutor(args.processes)
+        service = DungeonService(executor,args.limit,args.maxPending)
+        try:
+            asyncio.run(serve(args.host,args.port,service))
+        except KeyboardInterrupt:
+            pass
+
+    if args.command == 'load':
+        asyncio.run(load(args.host,args.port,args.requests,args.seeds,args.concurrency,
+                         {'width':args.width,'height':args.height,'seedRooms':args.seedRooms}))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+## A uniform grid broadphase.  Anything with a rect (x,y,w,h), in whatever
+## units, can be bucketed into the square cells it touches, so that collision tests only
+## need to look at things sharing a cell instead of everything.  Buckets
+## are dicts used as ordered sets so iteration order only depends on the
+## order things were inserted, never on memory addresses.
+
+import operator
+
+class SpatialHash(object):
+
+    def __init__(self,cellSize,rect=None):
+        '''
+        cellSize : width and height of a bucket in the rects' units, best a
+                   little bigger than the largest thing stored.
+            rect : function returning an item's rect, its rect attribute if
+                   None.
+        '''
+        self.cellSize = max(1,int(cellSize))
+        self.rect = operator.attrgetter('rect') if rect is None else rect
+        self.buckets = {}
+        self.cells = {}
+        # how many collided tests collide has made
+        self.tests = 0
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self,item):
+        return item in self.cells
+
+    def cellRange(self,rect):
+        '''
+        Returns the (x0,y0,x1,y1) of cells, inclusive, that rect touches.
+        '''
+        x,y,w,h = rect
+        s = self.cellSize
+        x0,x1 = min(x,x+w),max(x,x+w)
+        y0,y1 = min(y,y+h),max(y,y+h)
+        return (x0 // s,y0 // s,x1 // s,y1 // s)
+
+    def insert(self,item):
+        r = self.cellRange(self.rect(item))
+        self.cells[item] = r
+        for cx in range(r[0],r[2]+1):
+            for cy in range(r[1],r[3]+1):
+                self.buckets.setdefault((cx,cy),{})[item] = None
+
+    def remove(self,item):
+        r = self.cells.pop(item)
+        for cx in range(r[0],r[2]+1):
+            for cy in range(r[1],r[3]+1):
+                bucket = self.buckets[(cx,cy)]
+                del(bucket[item])
+                if not bucket:
+                    del(self.buckets[(cx,cy)])
+
+    def move(self,item):
+        '''
+        Call after item's rect has changed, rebuckets item only if it
+        crossed into different cells.  Returns True if it was rebucketed.
+        '''
+        if self.cells.get(item) == self.cellRange(self.rect(item)):
+            return False
+        if item in self.cells:
+            self.remove(item)
+        self.insert(item)
+        return True
+
+    def query(self,rect):
+        '''
+        Returns the items sharing a cell with rect, the candidates for
+        colliding with it.
+        '''
+        r = self.cellRange(rect)
+        found = {}
+        buckets = self.buckets
+        for cx in range(r[0],r[2]+1):
+            for cy in range(r[1],r[3]+1):
+                try:
+                    found.update(buckets[(cx,cy)])
+                except KeyError:
+                    pass
+        return found
+
+    def collide(self,item,collided,limit=None):
+        '''
+        Returns the items for which collided(item,other) is True, stopping
+        once limit of them have been found if limit isn't None.
+        '''
+        r = self.cellRange(self.rect(item))
+        buckets = self.buckets
+        found = []
+        seen = set()
+        for cx in range(r[0],r[2]+1):
+            for cy in range(r[1],r[3]+1):
+                for other in buckets.get((cx,cy),()):
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    if collided(item,other):
+                        found.append(other)
+                        if len(found) == limit:
+                            self.tests += len(seen)
+                            return found
+        self.tests += len(seen)
+        return found
+
+    def pairs(self,collided):
+        '''
+        Returns every pair (left,right) of stored items for which
+        collided(left,right) is True, each pair reported once.
+        '''
+        found = []
+        seen = set()
+        for bucket in self.buckets.values():
+            if len(bucket) < 2:
+                continue
+            items = list(bucket)
+            for i,left in enumerate(items):
+                for right in items[i+1:]:
+                    key = (id(left),id(right)) if id(left) < id(right) else (id(right),id(left))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if collided(left,right):
+                        found.append((left,right))
+        return found
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+## A layout as a tile map, a uint8 numpy array with one cell per grid unit
+## holding the layer of the room over it, EMPTY where there is no room.
+## tiles[r,c] is the cell c across and r down from the top left of the
+## layout's bound.  Needs numpy, which Layout only imports when asked for
+## tiles.
+##
+## Tile maps can be shrunk for sending with pack, two bits a cell, or
+## runLengthEncode.
+
+import numpy as np
+
+from Layout import Layout
+
+EMPTY = 255
+
+# tile values in the order of their two bit codes
+TILES = np.array([EMPTY,Layout.VOIDS,Layout.HALLS,Layout.MAIN_ROOMS],dtype=np.uint8)
+
+_codes = np.zeros(256,dtype=np.uint8)
+_codes[TILES] = np.arange(len(TILES),dtype=np.uint8)
+
+def cellsUnder(x,y,w,h,origin,pitch):
+    '''
+    Vectorised Occupancy.cellsUnder for arrays of screen rects, returns the
+    (c0,r0,c1,r1) arrays relative to the screen coords origin, unclipped.
+    '''
+    ox,oy = origin
+    x = x - ox
+    y = y - oy
+    return ((x + 1) // pitch,(y + 1) // pitch,
+            -(-(x + w - 2) // pitch),-(-(y + h - 2) // pitch))
+
+def coverage(shape,c0,r0,c1,r1):
+    '''
+    A boolean array of shape that is True in every cell covered by one of
+    the [c0,c1) x [r0,r1) boxes.  The boxes are summed into a table of
+    corners that is integrated once, rather than filled one at a time.
+    '''
+    rows,columns = shape
+    c0 = np.clip(c0,0,columns)
+    c1 = np.clip(c1,0,columns)
+    r0 = np.clip(r0,0,rows)
+    r1 = np.clip(r1,0,rows)
+    keep = (c0 < c1) & (r0 < r1)
+    c0,c1,r0,r1 = c0[keep],c1[keep],r0[keep],r1[keep]
+
+    corners = np.zeros((rows+1,columns+1),dtype=np.int32)
+    np.add.at(corners,(r0,c0),1)
+    np.add.at(corners,(r0,c1),-1)
+    np.add.at(corners,(r1,c0),-1)
+    np.add.at(corners,(r1,c1),1)
+    return corners.cumsum(0).cumsum(1)[:rows,:columns] > 0
+
+def rasterise(layout,bounds=None):
+    '''
+    Returns the layout's tile map covering the screen rect bounds, by
+    default the layout's bound.  Where rooms overlap the higher layer wins.
+    '''
+    if bounds is None:
+        bounds = layout.bound
+    bx,by,bw,bh = bounds
+    pitch = layout.gridSpacing+1
+    columns = max(0,-(-(bw - 2) // pitch))
+    rows = max(0,-(-(bh - 2) // pitch))
+
+    tiles = np.full((rows,columns),EMPTY,dtype=np.uint8)
+    rooms = layout.rooms
+    if not rooms:
+        return tiles
+
+    x = np.array([r.x for r in rooms],dtype=np.int64)
+    y = np.array([r.y for r in rooms],dtype=np.int64)
+    w = np.array([r.w for r in rooms],dtype=np.int64)
+    h = np.array([r.h for r in rooms],dtype=np.int64)
+    layer = np.array([r.layer for r in rooms],dtype=np.int64)
+    c0,r0,c1,r1 = cellsUnder(x,y,w,h,(bx,by),pitch)
+
+    for value in (Layout.VOIDS,Layout.HALLS,Layout.MAIN_ROOMS):
+        mine = layer == value
+        if mine.any():
+            tiles[coverage(tiles.shape,c0[mine],r0[mine],c1[mine],r1[mine])] = value
+    return tiles
+
+def pack(tiles):
+    '''
+    Packs a tile map into bytes at two bits a cell, four cells to a byte
+    starting in the low bits.  Unpack needs the map's shape back.
+    '''
+    codes = _codes[tiles.ravel()]
+    codes = np.concatenate((codes,np.zeros(-len(codes) % 4,dtype=np.uint8))).reshape(-1,4)
+    return (codes[:,0] | (codes[:,1] << 2) | (codes[:,2] << 4) | (codes[:,3] << 6)).tobytes()
+
+def unpack(packed,shape):
+    '''
+    The tile map of the given shape in the bytes made by pack.
+    '''
+    packed = np.frombuffer(packed,dtype=np.uint8)
+    codes = np.stack((packed & 3,(packed >> 2) & 3,(packed >> 4) & 3,packed >> 6),axis=1)
+    rows,columns = shape
+    return TILES[codes.ravel()[:rows * columns]].reshape(shape)
+
+def runLengthEncode(tiles):
+    '''
+    Run length encodes the tile map row after row, returns the (values,
+    lengths) arrays of the runs as uint8 and uint32.
+    '''
+    flat = tiles.ravel()
+    if not len(flat):
+        return np.zeros(0,dtype=np.uint8),np.zeros(0,dtype=np.uint32)
+    starts = np.concatenate(([0],np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    lengths = np.diff(np.append(starts,len(flat)))
+    return flat[starts],lengths.astype(np.uint32)
+
+def runLengthDecode(values,lengths,shape):
+    '''
+    The tile map of the given shape from runLengthEncode's runs.
+    '''
+    return np.repeat(np.asarray(values,dtype=np.uint8),lengths).reshape(shape)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+## An endless dungeon made of square chunks.  Each chunk is an ordinary
+## layout generated by the usual stages, seeded from the world's seed and
+## its chunk coordinates, so any chunk can be made on its own and always
+## comes out the same.  Chunks are stitched together by portals, a cell on
+## each border between two chunks that both of them run a corridor to.
+##
+##   world = World(seed=42)
+##   for (cx,cy),layout in world.around(x,y,radius=1):
+##       ...
+##
+## Rooms are in world coords, chunk (cx,cy) covers the screen rect
+## (cx*size,cy*size,size,size) where size is world.size.
+
+import hashlib
+import struct
+
+import Corridors
+from Layout import roundm
+from Pipeline import Pipeline
+
+class ChunkPipeline(Pipeline):
+    '''
+    The generation stages for one chunk of a world.  Rooms are kept on the
+    world's grid and inside the chunk, and corridors are run to the portals
+    on the chunk's borders.
+    '''
+
+    STAGES = ('rooms','separate','center','clip','mainRooms','voids','connect','halls','portals')
+    PARAMS = dict(Pipeline.PARAMS,clip=(),portals=())
+
+    def __init__(self,world,cx,cy):
+        self.world = world
+        self.cx = cx
+        self.cy = cy
+        size = world.size
+        super(ChunkPipeline,self).__init__(size,size,seed=world.chunkSeed(cx,cy),
+                                           keep=False,**world.params)
+
+    def _clip(self,layout):
+        layout.clip((0,0,layout.width+1,layout.height+1))
+        return layout
+
+    def _voids(self,layout):
+        # inFillWithVoids leaves off the last grid unit of its bounds
+        grid = layout.gridSpacing+1
+        layout.inFillWithVoids(bounds=(0,0,layout.width+grid,layout.height+grid))
+        return layout
+
+    def _portals(self,layout):
+        router = Corridors.CorridorRouter(layout,self.params['hallwidth'])
+        if not router.owner:
+            return layout
+        grid = layout.gridSpacing+1
+        half = grid // 2
+        rooms = layout.mainRooms
+
+        cells = []
+        for c,r in self.world.portals(self.cx,self.cy):
+            cells.append(router.cellAt(c * grid + half,r * grid + half))
+
+        if not rooms:
+            # nothing to connect to, the portals just lead to each other
+            for start,goal in zip(cells,cells[1:]):
+                router.connect(start,goal)
+            return layout
+
+        for cell in cells:
+            x,y = router.grid.cellOrigin(cell % router.columns,cell // router.columns)
+            room = min(rooms,key=lambda r: ((r.center[0]-x)**2 + (r.center[1]-y)**2,r.id))
+            router.connect(router.cellOf(room),cell,(room,))
+        return layout
+
+    def run(self,until='portals'):
+        layout = super(ChunkPipeline,self).run(until)
+        # chunks are a whole number of cells across
+        cells = self.world.cells
+        for room in layout.rooms:
+            room.gx += self.cx * cells
+            room.gy += self.cy * cells
+        layout._broadphase = None
+        return layout
+
+
+class World(object):
+
+    def __init__(self,size=1024,seed=0,**params):
+        '''
+        size   : width and height of a chunk in pixels, rounded up to the grid
+        seed   : the world's seed, every chunk's seed is made from it
+        params : the rest of Pipeline's parameters, used for every chunk
+        '''
+        self.params = params
+        self.seed = seed
+        grid = params.get('gridSpacing',8)+1
+        self.size = roundm(size,grid)
+        self.cells = self.size // grid
+
+    def chunkSeed(self,cx,cy):
+        '''
+        The seed of chunk (cx,cy), the same in every process and run.
+        '''
+        return self.hash(b'chunk',cx,cy)
+
+    def hash(self,kind,*values):
+        text = repr((self.seed,) + values).encode('utf-8')
+        return struct.unpack('<Q',hashlib.sha256(kind + text).digest()[:8])[0]
+
+    def origin(self,cx,cy):
+        return (cx * self.size,cy * self.size)
+
+    def chunkAt(self,x,y):
+        '''
+        The coords of the chunk containing the world point x,y.
+        '''
+        return (x // self.size,y // self.size)
+
+    def portal(self,kind,cx,cy):
+        '''
+        Where along a border its portal is, in cells from the border's start,
+        kept away from the corners.  kind is b'v' for the left border of
+        chunk (cx,cy) and b'h' for its top border.
+        '''
+        if self.cells < 3:
+            return 0
+        return 1 + self.hash(kind,cx,cy) % (self.cells - 2)
+
+    def portals(self,cx,cy):
+        '''
+        The (c,r) cells of chunk (cx,cy)'s four portals, in the chunk's cells.
+        '''
+        last = self.cells - 1
+        return [(0,self.portal(b'v',cx,cy)),
+                (last,self.portal(b'v',cx+1,cy)),
+                (self.portal(b'h',cx,cy),0),
+                (self.portal(b'h',cx,cy+1),last)]
+
+    def chunk(self,cx,cy):
+        '''
+        Generates chunk (cx,cy) as a Layout in world coords.
+        '''
+        return ChunkPipeline(self,cx,cy).run()
+
+    def chunks(self,coords):
+        '''
+        Lazily generates the chunks at coords, yielding ((cx,cy),layout).
+        '''
+        for cx,cy in coords:
+            yield (cx,cy),self.chunk(cx,cy)
+
+    def near(self,x,y,radius=1):
+        '''
+        The coords of the chunks within radius chunks of the world point x,y,
+        nearest first.
+        '''
+        px,py = self.chunkAt(x,y)
+        coords = [(px+dx,py+dy) for dy in range(-radius,radius+1)
+                                 for dx in range(-radius,radius+1)]
+        return sorted(coords,key=lambda c: (max(abs(c[0]-px),abs(c[1]-py)),c[1],c[0]))
+
+    def around(self,x,y,radius=1):
+        '''
+        Lazily generates the chunks around the world point x,y, see near.
+        '''
+        return self.chunks(self.near(x,y,radius))
+
+    def stream(self,players,radius=1):
+        '''
+        Keeps the chunks around a moving set of players.  players is an
+        iterable that gives the (x,y) of every player each time they move.
+        Yields ((cx,cy),layout) for each chunk as it comes within radius of
+        a player and ((cx,cy),None) once it is no longer near any, at which
+        point it should be dropped.  Only the chunks near players are held.
+        '''
+        loaded = set()
+        for positions in players:
+            wanted = []
+            for x,y in positions:
+                for c in self.near(x,y,radius):
+                    if c not in wanted:
+                        wanted.append(c)
+            for c in sorted(loaded - set(wanted)):
+                loaded.discard(c)
+                yield c,None
+            for c in wanted:
+                if c not in loaded:
+                    loaded.add(c)
+                    yield c,self.chunk(*c)
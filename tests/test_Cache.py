@@ -0,0 +1,60 @@
+import random
+import struct
+
+import pytest
+
+import DungeonFile
+from Cache import DungeonCache
+from Layout import Layout
+
+def test_key_fills_in_defaults():
+    assert DungeonCache.key(512,512,seed=1) == DungeonCache.key(512,512,seed=1,separation='grid')
+
+def test_budget_runs_are_not_cached(tmp_path):
+    cache = DungeonCache(str(tmp_path))
+    with pytest.raises(ValueError):
+        cache.generate(512,512,seed=1,separation='bounded',separationBudget=0.01)
+    assert len(cache) == 0
+    # an iteration limit alone is the same on every machine
+    cache.generate(512,512,seed=1,separation='bounded',separationLimit=10)
+    assert len(cache) == 1
+
+def test_separation_history_starts_empty():
+    assert Layout(512,512,10,10).separationHistory == []
+
+def test_dungeon_without_edges_comes_back_from_disk(tmp_path):
+    data = DungeonCache(str(tmp_path)).generateData(256,256,seed=1,seedRooms=1)
+    cache = DungeonCache(str(tmp_path))
+    assert cache.get(DungeonCache.key(256,256,seed=1,seedRooms=1)) == data
+    assert cache.hits == 1
+
+def damaged(blob,count,rng):
+    '''
+    count copies of blob, truncated or with random bytes overwritten, the
+    first with an edge to a room that isn't there.
+    '''
+    nrooms = DungeonFile.HEADER.unpack_from(blob,0)[7]
+    bad = bytearray(blob)
+    struct.pack_into('<i',bad,DungeonFile.HEADER.size + DungeonFile.ROOM.size * nrooms,1 << 20)
+    yield bad
+    for i in range(1,count):
+        bad = bytearray(blob)
+        if rng.random() < 0.3:
+            del bad[rng.randint(0,len(blob)):]
+        for j in range(0,rng.randint(1,8)):
+            if bad:
+                bad[rng.randrange(len(bad))] = rng.randrange(256)
+        yield bad
+
+def test_damaged_entries_are_misses(tmp_path):
+    key = DungeonCache.key(256,256,seed=2,seedRooms=20)
+    DungeonCache(str(tmp_path)).generate(256,256,seed=2,seedRooms=20)
+    with open(DungeonCache(str(tmp_path)).path(key),'rb') as f:
+        blob = f.read()
+    for bad in damaged(blob,1000,random.Random(0)):
+        cache = DungeonCache(str(tmp_path))
+        with open(cache.path(key),'wb') as f:
+            f.write(bad)
+        # either it still decodes or it's forgotten, never an exception
+        if cache.get(key) is None:
+            assert key not in cache
@@ -0,0 +1,40 @@
+import collections
+
+import pytest
+
+import Corridors
+from Layout import Layout
+
+def reachable(router,start):
+    '''
+    The cells reachable from start through halls and main rooms.
+    '''
+    seen = {start}
+    queue = collections.deque([start])
+    while queue:
+        i = queue.popleft()
+        for j in router.neighbors(i):
+            room = router.owner[j]
+            if j not in seen and room is not None and (room.isHall or room.isMainRoom):
+                seen.add(j)
+                queue.append(j)
+    return seen
+
+@pytest.mark.parametrize('method',['astar','lshape'])
+def test_connected_rooms_are_joined_by_halls(method):
+    layout = Layout.generate(768,768,seed=6,seedRooms=120,halls=method)
+    router = Corridors.CorridorRouter(layout)
+    assert layout.edges
+    for room,neighbor in layout.edges:
+        assert router.cellOf(neighbor) in reachable(router,router.cellOf(room))
+
+def test_route_carves_only_voids():
+    layout = Layout.generate(768,768,seed=6,seedRooms=120)
+    for room in layout.roomsInLayer(Layout.HALLS):
+        room.layer = Layout.VOIDS
+    before = dict((room.id,room.layer) for room in layout.rooms)
+    Corridors.route(layout,hallwidth=3)
+    carved = [room for room in layout.rooms if room.layer != before[room.id]]
+    assert carved
+    for room in carved:
+        assert before[room.id] == Layout.VOIDS and room.isHall
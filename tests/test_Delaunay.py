@@ -0,0 +1,35 @@
+import random
+
+from Delaunay import triangulate, orient
+
+def hull(points):
+    '''
+    The convex hull of points, counter clockwise, by Andrew's monotone chain.
+    '''
+    points = sorted(set(points))
+    lower = []
+    upper = []
+    for p in points:
+        while len(lower) >= 2 and orient(lower[-2],lower[-1],p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(points):
+        while len(upper) >= 2 and orient(upper[-2],upper[-1],p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+def area2(polygon):
+    n = len(polygon)
+    return sum(polygon[i][0]*polygon[(i+1) % n][1] - polygon[(i+1) % n][0]*polygon[i][1]
+               for i in range(n))
+
+def test_triangles_cover_the_hull():
+    for seed in range(200):
+        rng = random.Random(seed)
+        size = rng.choice((20,1000,10**6))
+        points = [(rng.randint(0,size),rng.randint(0,size))
+                  for i in range(rng.randint(3,200))]
+        triangles = triangulate(points)
+        assert all(orient(points[i],points[j],points[k]) > 0 for i,j,k in triangles)
+        assert sum(orient(points[i],points[j],points[k]) for i,j,k in triangles) == area2(hull(points))
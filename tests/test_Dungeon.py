@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pygame = pytest.importorskip('pygame')
+
+from Dungeon import Dungeon
+
+@pytest.fixture(scope='module',autouse=True)
+def display():
+    os.environ.setdefault('SDL_VIDEODRIVER','dummy')
+    pygame.init()
+    pygame.display.set_mode((8,8))
+    yield
+    pygame.quit()
+
+@pytest.mark.parametrize('seed',[0,1,2])
+def test_toSurface_matches_drawing_every_room(seed):
+    dungeon = Dungeon.generate(1024,1024,seed=seed)
+    drawn = pygame.Surface((1024,1024))
+    dungeon.drawAll(drawn,drawBounds=False)
+
+    bound = dungeon.bound
+    whole = dungeon.toSurface(bound)
+    seen = bound.clip(drawn.get_rect())
+    part = whole.subsurface(seen.move(-bound.x,-bound.y))
+    assert (pygame.surfarray.array3d(part) == pygame.surfarray.array3d(drawn.subsurface(seen))).all()
+
+def test_incremental_draw_matches_full_draw():
+    dungeon = Dungeon.generate(1024,1024,seed=4)
+    drawn = pygame.Surface((1024,1024))
+    dungeon.draw(drawn)
+    halls = dungeon.halls[:50]
+    for room in halls:
+        dungeon.setRoomType(room,Dungeon.MAIN_ROOMS)
+    assert dungeon.draw(drawn) != [drawn.get_rect()]
+
+    full = pygame.Surface((1024,1024))
+    dungeon.drawAll(full)
+    assert pygame.image.tostring(drawn,'RGB') == pygame.image.tostring(full,'RGB')
@@ -0,0 +1,53 @@
+import gc
+import weakref
+
+import pytest
+
+import DungeonFile
+from Layout import Layout
+
+@pytest.fixture
+def layout():
+    return Layout.generate(512,512,seed=1,seedRooms=40)
+
+@pytest.fixture
+def path(tmp_path,layout):
+    path = str(tmp_path / 'level.dungeon')
+    DungeonFile.save(layout,path)
+    return path
+
+def test_close_after_array(path,layout):
+    pytest.importorskip('numpy')
+    dungeon = DungeonFile.load(path)
+    rooms = dungeon.array()
+    mapped = weakref.ref(dungeon.buffer)
+    dungeon.close()
+    # the array still reads the map, which goes once the array does
+    assert rooms['x'].tolist() == [room[1] for room in layout.toData()['rooms']]
+    assert mapped() is not None
+    del rooms
+    gc.collect()
+    assert mapped() is None
+
+def test_close_without_array(path):
+    with DungeonFile.load(path) as dungeon:
+        mapped = dungeon.buffer
+        dungeon.graph()
+    assert mapped.closed
+
+@pytest.mark.parametrize('seedRooms',[0,1,2,40])
+def test_save_load_round_trip(tmp_path,seedRooms):
+    # 0 makes a dungeon without rooms, 1 and 2 ones without edges
+    if seedRooms:
+        layout = Layout.generate(256,256,seed=1,seedRooms=seedRooms)
+    else:
+        layout = Layout(256,256,10,10)
+    path = str(tmp_path / 'level.dungeon')
+    DungeonFile.save(layout,path)
+    with DungeonFile.load(path) as dungeon:
+        assert dungeon.toData() == layout.toData()
+        graph = dungeon.graph()
+        expected = layout.graphIndex()
+        assert list(graph.ids) == list(expected.ids)
+        assert list(graph.hopCounts) == list(expected.hopCounts)
+    assert DungeonFile.unpack(DungeonFile.pack(layout.toData())) == layout.toData()
@@ -0,0 +1,57 @@
+import pytest
+
+import DungeonFile
+from Graph import GraphIndex, INF
+from Layout import Layout
+
+@pytest.fixture(scope='module')
+def layout():
+    return Layout.generate(1024,1024,seed=4,seedRooms=300)
+
+def queries(graph):
+    ids = list(graph.ids)
+    found = [graph.diameter]
+    for a in ids:
+        found.append(graph.farthest(a))
+        for b in ids:
+            found.append((graph.hops(a,b),graph.distance(a,b),graph.path(a,b)))
+    return found
+
+def test_searching_rows_when_needed_matches_the_tables(layout):
+    dense = layout.graphIndex(dense=True)
+    sparse = layout.graphIndex(dense=False)
+    assert dense.dense and not sparse.dense
+    assert queries(sparse) == queries(dense)
+
+def test_path_follows_edges(layout):
+    graph = layout.graphIndex()
+    ids = list(graph.ids)
+    for b in ids:
+        path = graph.path(ids[0],b)
+        if graph.distance(ids[0],b) == INF:
+            assert path == []
+            continue
+        assert path[0] == ids[0] and path[-1] == b
+        assert len(path) - 1 >= graph.hops(ids[0],b)
+        for x,y in zip(path,path[1:]):
+            assert y in graph.neighbors(x)
+
+def test_big_graphs_search_when_asked():
+    # a line of nodes, too many for the n*n tables
+    n = GraphIndex.DENSE_LIMIT + 1
+    graph = GraphIndex.build(list(range(0,n)),[(i,0) for i in range(0,n)],
+                             [(i,i+1) for i in range(0,n-1)])
+    assert not graph.dense
+    assert graph.hops(0,n-1) == n-1
+    assert graph.farthest(0) == n-1
+    assert graph.diameter == (n-1,0,n-1)
+    assert len(graph._rows) <= GraphIndex.ROWS
+
+@pytest.mark.parametrize('dense',[None,True,False])
+def test_stored_index_round_trip(tmp_path,layout,dense):
+    path = str(tmp_path / 'level.dungeon')
+    DungeonFile.save(layout,path,dense=dense)
+    with DungeonFile.load(path) as dungeon:
+        graph = dungeon.graph()
+        assert graph.dense == (dense is not False)
+        assert queries(graph) == queries(layout.graphIndex())
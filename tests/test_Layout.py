@@ -0,0 +1,50 @@
+import math
+
+from Layout import Layout, RoomRecord, collide_rooms, colliderect, inflate, roundm
+
+def test_roundm_matches_the_float_formula():
+    for m in (2,5,9,11):
+        for n in [-20.5,-9.3,-0.5,0,0.5,8.99,9,9.01,17.2,100,1234.75]:
+            assert roundm(n,m) == math.floor((n+m-1)/m)*m
+            assert type(roundm(n,m)) is int
+
+def test_separated_rooms_are_on_the_integer_grid():
+    layout = Layout.generate(1024,1024,seed=3)
+    grid = layout.gridSpacing+1
+    for room in layout.rooms:
+        assert type(room.x) is int and type(room.y) is int
+        # centering keeps them on the grid too
+        assert room.x % grid == 0 and room.y % grid == 0
+
+def test_rooms_are_kept_in_grid_units():
+    room = RoomRecord(0,10,-3,4,2,gridSpacing=8)
+    # pixels are snapped up to the grid once, on the way in
+    assert room.cells == (2,0,4,2)
+    assert room.rect == (18,0,37,19)
+    room.gx += 1
+    assert room.x == 27 and type(room.x) is int
+    data = Layout.generate(512,512,seed=4).toData()
+    assert Layout.fromData(data).toData() == data
+
+def test_collide_rooms_in_grid_units_matches_pixel_rects():
+    def pixels(left,right):
+        return colliderect(inflate(left.rect,-2,-2),inflate(right.rect,-2,-2))
+    rooms = [RoomRecord(i,x * 9,y * 9,w,h,8) for i,(x,y,w,h) in
+             enumerate([(0,0,3,3),(3,0,1,1),(2,2,2,2),(3,3,1,1),(-1,1,1,1),(1,-2,1,5)])]
+    for a in rooms:
+        for b in rooms:
+            if a is not b:
+                assert collide_rooms(a,b) == pixels(a,b)
+
+def test_testing_only_restless_rooms_separates_them_the_same():
+    import copy
+    from Benchmark import seededLayout
+    restless = seededLayout(1000,seed=1)
+    everyone = copy.deepcopy(restless)
+    while restless._gridStep():
+        pass
+    while True:
+        everyone._restless = None
+        if not everyone._gridStep():
+            break
+    assert [r.rect for r in restless.rooms] == [r.rect for r in everyone.rooms]
@@ -0,0 +1,20 @@
+from Layout import Layout
+from Levels import Levels, generate_levels, levelSeed
+
+def test_stairs_join_main_rooms_of_adjacent_levels():
+    levels = generate_levels(3,seed=1,workers=1,width=512,height=512,seedRooms=60)
+    assert len(levels) == 3
+    assert [s[0] for s in levels.stairs] == [0,1]
+    for level,down,up,x,y in levels.stairs:
+        lower = dict((r.id,r) for r in levels[level].mainRooms)
+        upper = dict((r.id,r) for r in levels[level+1].mainRooms)
+        rx,ry,rw,rh = lower[down].rect
+        assert up in upper
+        assert rx <= x < rx + rw and ry <= y < ry + rh
+        assert (down,level+1,up,x,y) in levels.stairsOn(level)
+
+def test_levels_are_their_seeds_layouts():
+    levels = generate_levels(2,seed=1,workers=1,width=512,height=512,seedRooms=60)
+    layout = Layout.generate(512,512,seed=levelSeed(1,1),seedRooms=60)
+    assert levels[1].toData() == layout.toData()
+    assert Levels.fromData(levels.toData()).toData() == levels.toData()
@@ -0,0 +1,11 @@
+import pytest
+
+from Parallel import generate_many
+
+def test_needs_n_or_seeds():
+    with pytest.raises(ValueError,match='seeds'):
+        generate_many(seedRooms=10)
+
+def test_generates_each_seed():
+    done = dict(generate_many(seeds=[3,4],workers=1,width=256,height=256,seedRooms=10))
+    assert sorted(done) == [3,4]
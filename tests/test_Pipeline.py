@@ -0,0 +1,41 @@
+import pytest
+
+from Layout import Layout
+from Pipeline import Pipeline
+
+PARAMS = {'width':512,'height':512,'seedRooms':80,'seed':3}
+
+def test_run_is_generate():
+    assert Pipeline(**PARAMS).run().toData() == Layout.generate(**PARAMS).toData()
+
+@pytest.mark.parametrize('change',[{'pickRatio':1.5},
+                                   {'pickPolicy':'area'},
+                                   {'loops':0.4},
+                                   {'hallwidth':1},
+                                   {'halls':'astar'},
+                                   {'halls':'lshape'},
+                                   {'separationLimit':4},
+                                   {'seed':4}])
+def test_resumed_run_is_a_run_from_scratch(change):
+    pipeline = Pipeline(**PARAMS)
+    pipeline.run()
+    pipeline.set(**change)
+    name = list(change)[0]
+    layout,todo = pipeline.resume()
+    # only the stage using the parameter and the ones after it run again
+    assert todo[0] == pipeline.stageUsing(name)
+    resumed = pipeline.run()
+    fresh = Pipeline(**dict(PARAMS,**change)).run()
+    assert resumed.toData() == fresh.toData()
+    # and again, from the snapshots the resumed run left
+    assert pipeline.run().toData() == fresh.toData()
+
+def test_run_until_then_finish():
+    pipeline = Pipeline(**PARAMS)
+    pipeline.run('center')
+    assert pipeline.resume()[1] == ('mainRooms','voids','connect','halls')
+    assert pipeline.run().toData() == Pipeline(**PARAMS).run().toData()
+
+def test_unknown_parameter():
+    with pytest.raises(TypeError):
+        Pipeline(**PARAMS).set(colour='red')
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import Service
+from Service import DungeonService
+
+PARAMS = {'width':512,'height':512,'seedRooms':30}
+
+def test_request_after_last_waiter_cancels_starts_over():
+    async def run():
+        service = DungeonService()
+        first = asyncio.ensure_future(service.generate(PARAMS,5))
+        await asyncio.sleep(0)
+        first.cancel()
+        try:
+            await first
+        except asyncio.CancelledError:
+            pass
+        # the cancelled generation may still be winding down
+        data = await service.generate(PARAMS,5)
+        return service,data
+
+    service,data = asyncio.run(run())
+    assert data['rooms']
+    assert service.counters['cancelled'] == 1
+    assert service.counters['generated'] == 1
+    assert not service.inflight
+
+def test_identical_requests_share_a_generation():
+    async def run():
+        service = DungeonService()
+        results = await asyncio.gather(*[service.generate(PARAMS,7) for i in range(4)])
+        return service,results
+
+    service,results = asyncio.run(run())
+    assert all(r is results[0] for r in results)
+    assert service.counters['generated'] == 1
+    assert service.counters['coalesced'] == 3
+
+def test_cancelled_generation_keeps_its_slot_until_the_stage_ends(monkeypatch):
+    lock = threading.Lock()
+    running = [0,0]
+    runStage = Service._runStage
+
+    def slowStage(*args):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.05)
+        try:
+            return runStage(*args)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    monkeypatch.setattr(Service,'_runStage',slowStage)
+
+    async def run():
+        service = DungeonService(executor=ThreadPoolExecutor(4),limit=1)
+        first = asyncio.ensure_future(service.generate(PARAMS,1))
+        while not running[0]:
+            await asyncio.sleep(0.001)
+        first.cancel()
+        second = await service.generate(PARAMS,2)
+        assert first.cancelled()
+        return second
+
+    assert asyncio.run(run())['rooms']
+    # the second generation never ran alongside the first one's last stage
+    assert running[1] == 1
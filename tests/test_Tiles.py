@@ -0,0 +1,41 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import Tiles
+from Layout import Layout
+
+@pytest.fixture(scope='module')
+def layout():
+    return Layout.generate(512,512,seed=5,seedRooms=80)
+
+def maps(layout):
+    yield layout.toTiles()
+    rng = np.random.default_rng(0)
+    # odd sizes leave a part filled byte at the end
+    for shape in [(0,0),(1,1),(1,3),(3,5),(7,9),(16,16)]:
+        yield Tiles.TILES[rng.integers(0,len(Tiles.TILES),shape)]
+
+def test_pack_round_trip(layout):
+    for tiles in maps(layout):
+        packed = Tiles.pack(tiles)
+        assert len(packed) == -(-tiles.size // 4)
+        assert np.array_equal(Tiles.unpack(packed,tiles.shape),tiles)
+
+def test_run_length_round_trip(layout):
+    for tiles in maps(layout):
+        values,lengths = Tiles.runLengthEncode(tiles)
+        assert lengths.sum() == tiles.size
+        assert np.all(values[1:] != values[:-1])
+        assert np.array_equal(Tiles.runLengthDecode(values,lengths,tiles.shape),tiles)
+
+def test_rooms_are_on_their_tiles(layout):
+    tiles = layout.toTiles()
+    bx,by,bw,bh = layout.bound
+    pitch = layout.gridSpacing+1
+    for room in layout.rooms:
+        cx,cy = room.center
+        tile = tiles[(cy - by) // pitch,(cx - bx) // pitch]
+        # where rooms share a cell the higher layer wins
+        assert tile != Tiles.EMPTY and tile >= room.layer
+    assert (tiles == Layout.MAIN_ROOMS).sum() == sum(r.width * r.height for r in layout.mainRooms)
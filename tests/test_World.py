@@ -0,0 +1,34 @@
+from World import World
+
+def world():
+    return World(size=512,seed=9,seedRooms=50)
+
+def test_chunks_are_the_same_every_time():
+    assert world().chunk(1,-2).toData() == world().chunk(1,-2).toData()
+    assert world().chunk(0,0).toData() != world().chunk(1,0).toData()
+
+def test_chunks_stay_in_their_square():
+    w = world()
+    for cx,cy in [(0,0),(-1,2)]:
+        x0,y0 = w.origin(cx,cy)
+        for room in w.chunk(cx,cy).rooms:
+            assert x0 <= room.x and room.x + room.w <= x0 + w.size + 1
+            assert y0 <= room.y and room.y + room.h <= y0 + w.size + 1
+
+def test_neighbors_agree_on_their_portals():
+    w = world()
+    last = w.cells - 1
+    assert w.portals(0,0)[1] == (last,w.portals(1,0)[0][1])
+    assert w.portals(0,0)[3] == (w.portals(0,1)[2][0],last)
+
+def test_portals_are_carved_into_halls():
+    w = world()
+    for cx,cy in [(0,0),(-1,2)]:
+        layout = w.chunk(cx,cy)
+        ox,oy = w.origin(cx,cy)
+        grid = layout.gridSpacing+1
+        for c,r in w.portals(cx,cy):
+            x,y = ox + c*grid + grid//2,oy + r*grid + grid//2
+            over = [room for room in layout.rooms
+                    if room.x <= x < room.x + room.w and room.y <= y < room.y + room.h]
+            assert over and all(room.isHall for room in over)